@@ -0,0 +1,64 @@
+"""Group commit for concurrent creates.
+
+With SCHOOL_GROUP_COMMIT_MS set, POST /students/ and POST /teachers/ park
+their payload here instead of writing it straight away. Requests arriving
+within that window (or until SCHOOL_GROUP_COMMIT_MAX are waiting) are written
+by one ``*_batch`` call in a single transaction on a worker thread, and each
+request gets back its own result or error.
+"""
+import asyncio
+import os
+from fastapi.concurrency import run_in_threadpool
+from database import SessionLocal
+
+GROUP_COMMIT_MS = float(os.getenv("SCHOOL_GROUP_COMMIT_MS", "0"))
+GROUP_COMMIT_MAX = int(os.getenv("SCHOOL_GROUP_COMMIT_MAX", "100"))
+
+class GroupCommitter:
+    def __init__(self, window_ms: float = GROUP_COMMIT_MS, max_batch: int = GROUP_COMMIT_MAX):
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._batches = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0
+
+    async def submit(self, write_batch, item):
+        """Queue ``item`` for ``write_batch(db, items)`` and wait for its outcome."""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        batch = self._batches.get(write_batch)
+        if batch is None:
+            batch = self._batches[write_batch] = {"items": [], "futures": []}
+            batch["timer"] = loop.call_later(self.window, self.flush, write_batch)
+        batch["items"].append(item)
+        batch["futures"].append(future)
+        if len(batch["items"]) >= self.max_batch:
+            self.flush(write_batch)
+        return await future
+
+    def flush(self, write_batch):
+        batch = self._batches.pop(write_batch, None)
+        if batch is not None:
+            batch["timer"].cancel()
+            asyncio.ensure_future(self.write(write_batch, batch))
+
+    async def write(self, write_batch, batch):
+        try:
+            outcomes = await run_in_threadpool(self.write_in_session, write_batch, batch["items"])
+        except Exception as e:
+            outcomes = [e] * len(batch["futures"])
+        for future, outcome in zip(batch["futures"], outcomes):
+            if future.done():
+                continue
+            if isinstance(outcome, Exception):
+                future.set_exception(outcome)
+            else:
+                future.set_result(outcome)
+
+    def write_in_session(self, write_batch, items):
+        with SessionLocal() as db:
+            return write_batch(db, items)
+
+group_committer = GroupCommitter()
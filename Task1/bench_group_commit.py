@@ -0,0 +1,75 @@
+"""Throughput of concurrent POST /students/ with and without group commit.
+
+Each window runs in a fresh interpreter against a fresh SQLite database (the
+settings are read at import), driving the app in-process through httpx's ASGI
+transport with --concurrency requests in flight. A window of 0 is the plain
+one-transaction-per-request path; keep --concurrency below the connection pool
+size (SCHOOL_DB_POOL_SIZE + SCHOOL_DB_MAX_OVERFLOW) for it, since each of those
+requests holds a pooled connection.
+
+    python bench_group_commit.py --requests 2000 --concurrency 25 --windows 0 2 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+def measure(requests: int, concurrency: int) -> dict:
+    import httpx
+    import datagen
+    import main
+
+    datagen.generate(students=0, teachers=0, subjects=20)
+    queue = asyncio.Queue()
+    for i in range(requests):
+        queue.put_nowait(i)
+    statuses = {}
+
+    async def client_loop(client):
+        while not queue.empty():
+            i = queue.get_nowait()
+            response = await client.post("/students/", json={
+                "name": f"Student {i}", "email": f"student{i}@bench.com", "subject_ids": [i % 20 + 1, (i + 7) % 20 + 1]
+            })
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    async def run():
+        async with httpx.AsyncClient(app=main.app, base_url="http://bench") as client:
+            await asyncio.gather(*(client_loop(client) for _ in range(concurrency)))
+
+    started = time.perf_counter()
+    asyncio.run(run())
+    elapsed = time.perf_counter() - started
+    return {"seconds": round(elapsed, 3), "requests_per_second": round(requests / elapsed, 1), "statuses": statuses}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=25)
+    parser.add_argument("--windows", type=float, nargs="+", default=[0, 2, 5], help="Group commit windows in ms")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(measure(args.requests, args.concurrency)))
+        return
+
+    for window in args.windows:
+        env = dict(
+            os.environ,
+            SCHOOL_DATABASE_URL=f"sqlite:///{tempfile.mkdtemp()}/bench.db",
+            SCHOOL_GROUP_COMMIT_MS=str(window)
+        )
+        output = subprocess.run(
+            [sys.executable, __file__, "--worker", "--requests", str(args.requests), "--concurrency", str(args.concurrency)],
+            env=env, capture_output=True, text=True, check=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"window {window:5.1f} ms  {result['requests_per_second']:8.1f} req/s  {result['seconds']:7.2f}s  {result['statuses']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Mixed read/write throughput for the engine settings in database.py.
+
+Each profile runs in a fresh interpreter (the pool settings are read at
+import) against a fresh SQLite file seeded with --students students.
+--threads threads share one engine for --seconds; each request opens a
+session and, with probability --write-share, inserts a student through
+insert_student, otherwise reads a 20-row get_students page. Profiles are
+every combination of --journals and --pool-sizes:
+
+  default  a plain create_engine: rollback journal, no busy_timeout
+  wal      make_engine: journal_mode=WAL, synchronous=NORMAL, busy_timeout
+
+    python bench_pool.py --threads 8 --seconds 5 --journals default wal --pool-sizes 5 10
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+def measure(journal: str, threads: int, seconds: float, write_share: float, students: int) -> dict:
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    import datagen
+    from database import SQLALCHEMY_DATABASE_URL, engine_options, make_engine
+    from operations import StudentOperations
+    from schemas import StudentBase
+
+    if journal == "wal":
+        engine = make_engine(SQLALCHEMY_DATABASE_URL)
+    else:
+        engine = create_engine(SQLALCHEMY_DATABASE_URL, **engine_options(SQLALCHEMY_DATABASE_URL))
+    datagen.generate(students=students, teachers=0, subjects=0, bind=engine)
+    Session = sessionmaker(bind=engine)
+    student_ops = StudentOperations()
+    results = {"reads": 0, "writes": 0, "errors": 0}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def client_loop(worker: int):
+        rng = random.Random(worker)
+        done = {"reads": 0, "writes": 0, "errors": 0}
+        while time.perf_counter() < deadline:
+            with Session() as db:
+                try:
+                    if rng.random() < write_share:
+                        student_ops.insert_student(db, StudentBase(
+                            name=f"Bench {worker}", email=f"bench{worker}-{done['writes']}@pool.test"
+                        ))
+                        done["writes"] += 1
+                    else:
+                        student_ops.get_students(db, page=rng.randint(1, 5), page_size=20)
+                        done["reads"] += 1
+                except Exception:
+                    done["errors"] += 1
+        with lock:
+            for key, value in done.items():
+                results[key] += value
+
+    workers = [threading.Thread(target=client_loop, args=(worker,)) for worker in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    results["requests_per_second"] = round((results["reads"] + results["writes"]) / seconds, 1)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--write-share", type=float, default=0.2)
+    parser.add_argument("--students", type=int, default=200)
+    parser.add_argument("--journals", nargs="+", choices=["default", "wal"], default=["default", "wal"])
+    parser.add_argument("--pool-sizes", type=int, nargs="+", default=[10])
+    parser.add_argument("--worker", choices=["default", "wal"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(measure(args.worker, args.threads, args.seconds, args.write_share, args.students)))
+        return
+
+    for pool_size in args.pool_sizes:
+        for journal in args.journals:
+            env = dict(
+                os.environ,
+                SCHOOL_DATABASE_URL=f"sqlite:///{tempfile.mkdtemp()}/bench.db",
+                SCHOOL_DB_POOL_SIZE=str(pool_size)
+            )
+            env.pop("SCHOOL_READ_DATABASE_URL", None)
+            output = subprocess.run(
+                [sys.executable, __file__, "--worker", journal, "--threads", str(args.threads),
+                 "--seconds", str(args.seconds), "--write-share", str(args.write_share),
+                 "--students", str(args.students)],
+                cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+                capture_output=True, text=True, check=True
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(
+                f"pool {pool_size:3d}  {journal:8s} {result['requests_per_second']:8.1f} req/s  "
+                f"reads {result['reads']:6d}  writes {result['writes']:6d}  errors {result['errors']}"
+            )
+
+if __name__ == "__main__":
+    main()
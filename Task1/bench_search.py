@@ -0,0 +1,80 @@
+"""Latency of SearchOperations.search on a large student table.
+
+Loads --students seeded students into a fresh SQLite file (names are two of
+sixteen first names, the second with a "son<i % 997>" suffix, emails are
+user<i>@school<i % 50>.com), runs migrations.upgrade to build the FTS5 index,
+then times every --queries term through both search paths: the FTS5 index
+(mean of --rounds runs) and the lower(name)/lower(email) prefix fallback used
+on other engines (mean of --prefix-rounds runs). --drop-prefix-indexes drops
+the expression indexes first, to time the fallback without them.
+
+    python bench_search.py --students 1000000
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+FIRST_NAMES = [
+    "alice", "bob", "carol", "dave", "erin", "frank", "grace", "heidi",
+    "ivan", "judy", "mallory", "oscar", "peggy", "trent", "victor", "walter"
+]
+QUERIES = ["alice", "ali", "grace walter", "user12345", "son12"]
+PREFIX_INDEXES = ["ix_students_name_lower", "ix_students_email_lower", "ix_teachers_name_lower", "ix_teachers_email_lower"]
+
+def student_rows(count: int, seed: int = 1):
+    rng = random.Random(seed)
+    for i in range(count):
+        yield {
+            "name": f"{rng.choice(FIRST_NAMES).title()} {rng.choice(FIRST_NAMES).title()}son{i % 997}",
+            "email": f"user{i}@school{i % 50}.com"
+        }
+
+def mean_ms(search, q: str, rounds: int):
+    search(q)  # warm the page cache and the statement cache
+    started = time.perf_counter()
+    for _ in range(rounds):
+        result = search(q)
+    return (time.perf_counter() - started) / rounds * 1000, len(result.items)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, default=1000000)
+    parser.add_argument("--queries", nargs="+", default=QUERIES)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--prefix-rounds", type=int, default=3)
+    parser.add_argument("--drop-prefix-indexes", action="store_true")
+    args = parser.parse_args()
+
+    os.environ["SCHOOL_DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+    from sqlalchemy import text
+    from database import Base, SessionLocal, engine
+    from datagen import insert_batched
+    from migrations import upgrade
+    from models import Student
+    from operations import SearchOperations
+
+    started = time.perf_counter()
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        insert_batched(conn, Student.__table__, student_rows(args.students))
+    upgrade(engine)
+    if args.drop_prefix_indexes:
+        with engine.begin() as conn:
+            for index in PREFIX_INDEXES:
+                conn.execute(text(f"DROP INDEX {index}"))
+    print(f"load + index {time.perf_counter() - started:8.1f}s  ({args.students} students)")
+
+    search_ops = SearchOperations()
+    with SessionLocal() as db:
+        for q in args.queries:
+            SearchOperations._fts_available = None
+            fts_ms, hits = mean_ms(lambda q: search_ops.search(db, q), q, args.rounds)
+            SearchOperations._fts_available = False
+            prefix_ms, _ = mean_ms(lambda q: search_ops.search(db, q), q, args.prefix_rounds)
+            print(f"q={q!r:16s} fts {fts_ms:9.2f} ms  prefix {prefix_ms:9.2f} ms  hits {hits}")
+        SearchOperations._fts_available = None
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Micro-benchmark: cost of turning a 100-item student page into response bytes.
+
+Compares the old path (nested dicts through jsonable_encoder and the stdlib
+JSONResponse) with the current one (Page[StudentOut] built from ORM objects,
+validated by FastAPI's response_model handling and rendered by ORJSONResponse).
+
+    python bench_serialization.py
+"""
+import asyncio
+import json
+import timeit
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from models import Student, Subject
+from schemas import Page, StudentOut
+
+PAGE_SIZE = 100
+SUBJECTS_PER_STUDENT = 5
+ROUNDS = 200
+
+def build_page():
+    subjects = [Subject(id=i, name=f"Subject {i}") for i in range(SUBJECTS_PER_STUDENT)]
+    return [
+        Student(id=i, name=f"Student {i}", email=f"student{i}@school.com", version=1, subjects=subjects)
+        for i in range(PAGE_SIZE)
+    ]
+
+def dict_path(students):
+    content = {
+        "items": [
+            {
+                "id": student.id,
+                "name": student.name,
+                "email": student.email,
+                "version": student.version,
+                "subjects": [{"id": subject.id, "name": subject.name} for subject in student.subjects]
+            }
+            for student in students
+        ],
+        "total": PAGE_SIZE,
+        "page": 1,
+        "page_size": PAGE_SIZE,
+        "pages": 1,
+        "next_cursor": None
+    }
+    return JSONResponse(jsonable_encoder(content)).body
+
+def model_path(students, field):
+    content = Page(
+        items=[StudentOut.model_validate(student) for student in students],
+        total=PAGE_SIZE,
+        page=1,
+        page_size=PAGE_SIZE,
+        pages=1
+    )
+    serialized = asyncio.run(serialize_response(field=field, response_content=content, is_coroutine=True))
+    return ORJSONResponse(serialized).body
+
+def main():
+    students = build_page()
+    field = create_response_field(name="response", type_=Page[StudentOut])
+    assert json.loads(dict_path(students)) == json.loads(model_path(students, field)), "paths serialize different payloads"
+
+    results = {
+        "dicts + jsonable_encoder + json": timeit.timeit(lambda: dict_path(students), number=ROUNDS),
+        "models + response_model + orjson": timeit.timeit(lambda: model_path(students, field), number=ROUNDS),
+    }
+    for name, seconds in results.items():
+        print(f"{name:36s} {seconds / ROUNDS * 1000:8.3f} ms per page")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Cold start: how long a fresh worker takes to import the app and answer.
+
+Every round starts a new interpreter that imports main, runs the startup
+hooks and serves one request through TestClient (requires httpx), against a
+database that already has the schema, like a worker restart. The database is
+a throwaway SQLite file or BENCH_DATABASE_URL, never SCHOOL_DATABASE_URL. Reports the
+median import time, time to first response inside the process, and wall time
+including interpreter start-up. Set SCHOOL_MIGRATE_ON_STARTUP=0 to measure
+workers that skip the migration check.
+
+    python bench_startup.py --rounds 5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+CHILD = """
+import time
+from fastapi.testclient import TestClient
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+with TestClient(main.app) as client:
+    status = client.get({path!r}).status_code
+print(imported - started, time.perf_counter() - started, status)
+"""
+
+def run_round(path: str, env: dict) -> dict:
+    started = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD.format(path=path)],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+        capture_output=True, text=True, check=True
+    ).stdout
+    wall = time.perf_counter() - started
+    import_time, first_response, status = output.split()[-3:]
+    return {
+        "import_ms": float(import_time) * 1000,
+        "first_response_ms": float(first_response) * 1000,
+        "wall_ms": wall * 1000,
+        "status": int(status)
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--path", default="/students/?page_size=1")
+    args = parser.parse_args()
+
+    # The first round migrates the database, so never point it at the app's own
+    workdir = tempfile.mkdtemp()
+    bench_url = os.getenv("BENCH_DATABASE_URL") or f"sqlite:///{workdir}/startup.db"
+    if bench_url == os.getenv("SCHOOL_DATABASE_URL"):
+        raise SystemExit("BENCH_DATABASE_URL must not be the app's SCHOOL_DATABASE_URL: the benchmark migrates it")
+    env = dict(
+        os.environ,
+        SCHOOL_DATABASE_URL=bench_url,
+        SCHOOL_JOBS_DATABASE_URL=f"sqlite:///{workdir}/jobs.db",
+        SCHOOL_JOBS_SPOOL_DIR=os.path.join(workdir, "uploads")
+    )
+    env.pop("SCHOOL_READ_DATABASE_URL", None)
+    run_round(args.path, dict(env, SCHOOL_MIGRATE_ON_STARTUP="1"))  # creates the schema
+    rounds = [run_round(args.path, env) for _ in range(args.rounds)]
+    for key in ("import_ms", "first_response_ms", "wall_ms"):
+        print(f"{key:18s} {statistics.median(r[key] for r in rounds):8.1f}")
+    print(f"{'status':18s} {rounds[-1]['status']:8d}")
@@ -0,0 +1,234 @@
+"""In-process benchmark of every route in main.py.
+
+Seeds a throwaway SQLite database (or the scratch database named by
+BENCH_DATABASE_URL, never SCHOOL_DATABASE_URL) with datagen, then drives each
+endpoint through FastAPI's TestClient (requires httpx) and reports
+p50/p95/p99 latency, throughput and SQL statements per request. Use --output to write the results
+as JSON and diff them between commits.
+
+    python benchmark.py --students 100000 --requests 200 --output bench.json
+"""
+import argparse
+import io
+import json
+import os
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+from collections import Counter
+from itertools import count
+
+def percentile(samples, pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+def build_endpoints(sizes: dict):
+    """Return (name, method, request builder, max requests) for every route.
+
+    Builders take the shared rng and a unique counter and return the path plus
+    any request keyword arguments (json body or uploaded files).
+    """
+    students, teachers, subjects = sizes["students"], sizes["teachers"], sizes["subjects"]
+
+    def student_id(rng):
+        return rng.randint(1, students)
+
+    def teacher_id(rng):
+        return rng.randint(1, teachers)
+
+    def subject_id(rng):
+        return rng.randint(1, subjects)
+
+    def subject_ids(rng):
+        return rng.sample(range(1, subjects + 1), min(3, subjects))
+
+    def cursor(rng, person_count):
+        from operations import BaseOperations
+        return BaseOperations().encode_cursor(rng.randint(0, max(person_count - 10, 0)))
+
+    def csv_upload(rng, unique):
+        batch = next(unique)
+        rows = "".join(
+            f"Bench {batch}-{i},bench{batch}-{i}@upload.com,\"{','.join(map(str, subject_ids(rng)))}\"\n"
+            for i in range(100)
+        )
+        content = ("name,email,subject_ids\n" + rows).encode()
+        return "/upload-csv/", {"files": {"file": ("bench.csv", io.BytesIO(content), "text/csv")}}
+
+    last_page = max(students // 10, 1)
+    return [
+        ("GET /students/ (offset)", "get", lambda rng, u: (f"/students/?page={rng.randint(1, last_page)}&page_size=10", {}), None),
+        ("GET /students/ (cursor)", "get", lambda rng, u: (f"/students/?cursor={cursor(rng, students)}&include_total=false", {}), None),
+        ("GET /students/{id}", "get", lambda rng, u: (f"/students/{student_id(rng)}", {}), None),
+        ("GET /students/batch", "get", lambda rng, u: (
+            "/students/batch?ids=" + ",".join(str(student_id(rng)) for _ in range(50)), {}
+        ), None),
+        ("POST /students/", "post", lambda rng, u: ("/students/", {"json": {
+            "name": "Bench Student", "email": f"bench-student-{next(u)}@bench.com", "subject_ids": subject_ids(rng)
+        }}), None),
+        ("PUT /students/{id}", "put", lambda rng, u: (f"/students/{student_id(rng)}", {"json": {
+            "name": "Bench Put", "email": f"bench-put-{next(u)}@bench.com", "subject_ids": subject_ids(rng)
+        }}), None),
+        ("PATCH /students/{id}", "patch", lambda rng, u: (f"/students/{student_id(rng)}", {"json": {
+            "subject_ids": subject_ids(rng)
+        }}), None),
+        ("POST /students/subjects", "post", lambda rng, u: ("/students/subjects", {"json": {
+            "student_ids": [student_id(rng) for _ in range(50)], "subject_ids": [subject_id(rng)]
+        }}), None),
+        ("DELETE /students/{id}/subjects/{id}", "delete", lambda rng, u: (
+            f"/students/{student_id(rng)}/subjects/{subject_id(rng)}", {}
+        ), None),
+        ("GET /students/export", "get", lambda rng, u: ("/students/export", {}), 5),
+        ("GET /teachers/ (offset)", "get", lambda rng, u: (f"/teachers/?page={rng.randint(1, max(teachers // 10, 1))}", {}), None),
+        ("GET /teachers/{id}", "get", lambda rng, u: (f"/teachers/{teacher_id(rng)}", {}), None),
+        ("GET /teachers/batch", "get", lambda rng, u: (
+            "/teachers/batch?ids=" + ",".join(str(teacher_id(rng)) for _ in range(20)), {}
+        ), None),
+        ("POST /teachers/", "post", lambda rng, u: ("/teachers/", {"json": {
+            "name": "Bench Teacher", "email": f"bench-teacher-{next(u)}@bench.com", "subject_ids": subject_ids(rng)
+        }}), None),
+        ("PUT /teachers/{id}", "put", lambda rng, u: (f"/teachers/{teacher_id(rng)}", {"json": {
+            "name": "Bench Put", "email": f"bench-teacher-put-{next(u)}@bench.com", "subject_ids": subject_ids(rng)
+        }}), None),
+        ("PATCH /teachers/{id}", "patch", lambda rng, u: (f"/teachers/{teacher_id(rng)}", {"json": {"name": "Bench Patch"}}), None),
+        ("POST /teachers/subjects", "post", lambda rng, u: ("/teachers/subjects", {"json": {
+            "teacher_ids": [teacher_id(rng) for _ in range(5)], "subject_ids": subject_ids(rng)
+        }}), None),
+        ("DELETE /teachers/{id}/subjects/{id}", "delete", lambda rng, u: (
+            f"/teachers/{teacher_id(rng)}/subjects/{subject_id(rng)}", {}
+        ), None),
+        ("GET /teachers/export", "get", lambda rng, u: ("/teachers/export?format=ndjson", {}), 5),
+        ("GET /subjects/", "get", lambda rng, u: (f"/subjects/?page={rng.randint(1, max(subjects // 10, 1))}", {}), 20),
+        ("GET /subjects/{id}", "get", lambda rng, u: (f"/subjects/{subject_id(rng)}", {}), None),
+        ("POST /subjects/batch", "post", lambda rng, u: ("/subjects/batch", {"json": {"ids": subject_ids(rng)}}), None),
+        ("POST /subjects/", "post", lambda rng, u: ("/subjects/", {"json": {"name": f"Bench Subject {next(u)}"}}), None),
+        ("PUT /subjects/{id}", "put", lambda rng, u: (f"/subjects/{subject_id(rng)}", {"json": {"name": "Bench Put"}}), None),
+        ("PATCH /subjects/{id}", "patch", lambda rng, u: (f"/subjects/{subject_id(rng)}", {"json": {"name": "Bench Patch"}}), None),
+        ("GET /subjects/{id}/students", "get", lambda rng, u: (f"/subjects/{subject_id(rng)}/students?page_size=50", {}), None),
+        ("GET /subjects/{id}/teachers", "get", lambda rng, u: (f"/subjects/{subject_id(rng)}/teachers", {}), None),
+        ("GET /subjects/{id}/students (stream)", "get", lambda rng, u: (f"/subjects/{subject_id(rng)}/students?stream=true", {}), 10),
+        ("GET /stats/subjects", "get", lambda rng, u: (f"/stats/subjects?page={rng.randint(1, max(subjects // 10, 1))}", {}), None),
+        ("GET /stats/subjects/top", "get", lambda rng, u: ("/stats/subjects/top?limit=10", {}), None),
+        ("GET /stats/students/subjects", "get", lambda rng, u: ("/stats/students/subjects", {}), None),
+        ("GET /search", "get", lambda rng, u: (f"/search?q={rng.choice(['ali', 'smith', 'grace lee', 'student12'])}", {}), None),
+        ("GET /debug/cache", "get", lambda rng, u: ("/debug/cache", {}), None),
+        ("GET /debug/metrics", "get", lambda rng, u: ("/debug/metrics", {}), None),
+        ("POST /upload-csv/", "post", csv_upload, 20),
+    ]
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(args) -> dict:
+    # The benchmark seeds fixed ids and writes through every route, so it never uses the
+    # app's database: a throwaway SQLite file, or the one named by BENCH_DATABASE_URL.
+    # The URLs have to be set before database.py builds its engines.
+    workdir = tempfile.mkdtemp()
+    bench_url = os.getenv("BENCH_DATABASE_URL") or f"sqlite:///{workdir}/benchmark.db"
+    if bench_url == os.getenv("SCHOOL_DATABASE_URL"):
+        raise SystemExit("BENCH_DATABASE_URL must not be the app's SCHOOL_DATABASE_URL: the benchmark writes to it")
+    os.environ["SCHOOL_DATABASE_URL"] = bench_url
+    os.environ.pop("SCHOOL_READ_DATABASE_URL", None)
+    os.environ["SCHOOL_JOBS_DATABASE_URL"] = f"sqlite:///{workdir}/jobs.db"
+    os.environ["SCHOOL_JOBS_SPOOL_DIR"] = os.path.join(workdir, "uploads")
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event
+    import database
+    import datagen
+    import main
+
+    sizes = datagen.generate(
+        args.students, args.teachers, args.subjects,
+        args.enrollments_per_student, args.subjects_per_teacher, args.seed
+    )
+
+    statements = Counter()
+    def count_statement(conn, cursor, statement, parameters, context, executemany):
+        statements["current"] += 1
+    engines = {database.engine, database.read_engine}
+    if database.async_engine is not None:
+        engines |= {database.async_engine.sync_engine, database.async_read_engine.sync_engine}
+    for bound in engines:
+        event.listen(bound, "before_cursor_execute", count_statement)
+
+    rng = random.Random(args.seed)
+    unique = count()
+    client = TestClient(main.app)
+    results = {}
+    for name, method, build, max_requests in build_endpoints(sizes):
+        if args.only and args.only not in name:
+            continue
+        total = min(args.requests, max_requests) if max_requests else args.requests
+        latencies, statement_counts, statuses = [], [], Counter()
+        for i in range(args.warmup + total):
+            path, kwargs = build(rng, unique)
+            statements["current"] = 0
+            started = time.perf_counter()
+            response = getattr(client, method)(path, **kwargs)
+            elapsed = time.perf_counter() - started
+            if i < args.warmup:
+                continue
+            latencies.append(elapsed * 1000)
+            statement_counts.append(statements["current"])
+            statuses[response.status_code] += 1
+
+        results[name] = {
+            "requests": total,
+            "statuses": dict(statuses),
+            "server_errors": sum(n for status, n in statuses.items() if status >= 500),
+            "p50_ms": round(percentile(latencies, 50), 3),
+            "p95_ms": round(percentile(latencies, 95), 3),
+            "p99_ms": round(percentile(latencies, 99), 3),
+            "mean_ms": round(statistics.fmean(latencies), 3),
+            "throughput_rps": round(1000 * len(latencies) / sum(latencies), 1),
+            "sql_statements_mean": round(statistics.fmean(statement_counts), 2),
+            "sql_statements_max": max(statement_counts),
+        }
+
+    return {
+        "revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "database": os.environ["SCHOOL_DATABASE_URL"],
+        "async": database.USE_ASYNC_DB,
+        "dataset": sizes,
+        "requests_per_endpoint": args.requests,
+        "endpoints": results,
+    }
+
+def print_report(report: dict):
+    print(f"revision {report['revision']}  dataset {report['dataset']}")
+    print(f"{'endpoint':40s} {'p50':>8s} {'p95':>8s} {'p99':>8s} {'req/s':>8s} {'sql':>6s} {'5xx':>4s}")
+    for name, row in report["endpoints"].items():
+        print(
+            f"{name:40s} {row['p50_ms']:8.2f} {row['p95_ms']:8.2f} {row['p99_ms']:8.2f} "
+            f"{row['throughput_rps']:8.1f} {row['sql_statements_mean']:6.1f} {row['server_errors']:4d}"
+        )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students", type=int, default=10000)
+    parser.add_argument("--teachers", type=int, default=500)
+    parser.add_argument("--subjects", type=int, default=100)
+    parser.add_argument("--enrollments-per-student", type=int, default=3)
+    parser.add_argument("--subjects-per-teacher", type=int, default=2)
+    parser.add_argument("--requests", type=int, default=100, help="Measured requests per endpoint")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--only", help="Run only endpoints whose name contains this text")
+    parser.add_argument("--output", help="Write the JSON report to this file")
+    args = parser.parse_args()
+
+    report = run(args)
+    print_report(report)
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
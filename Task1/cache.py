@@ -0,0 +1,109 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable, Iterable, Optional
+
+class LRUBackend:
+    """In-process LRU store. Each worker process has its own copy.
+
+    Entries older than ``ttl`` seconds are treated as missing (``None`` keeps
+    them until they are evicted or deleted).
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: Optional[float] = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable):
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at is not None and time.monotonic() >= expires_at:
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value):
+        expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._items[key] = (value, expires_at)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            self._items.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+class EntityCache:
+    """Read-through cache of serialized student/teacher/subject views.
+
+    Any object with get/set/delete/clear can be passed as ``backend`` to share
+    entries between workers (e.g. a thin wrapper around Redis).
+    """
+
+    def __init__(self, backend=None, enabled: bool = True):
+        self.backend = backend if backend is not None else LRUBackend()
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, kind: str, entity_id: int) -> Optional[dict]:
+        if not self.enabled:
+            return None
+        value = self.backend.get((kind, entity_id))
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, kind: str, entity_id: int, value: dict):
+        if self.enabled:
+            self.backend.set((kind, entity_id), value)
+
+    def invalidate(self, kind: str, entity_ids: Iterable[int]):
+        if not self.enabled:
+            return
+        for entity_id in entity_ids:
+            self.backend.delete((kind, entity_id))
+            self.invalidations += 1
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "size": len(self.backend) if hasattr(self.backend, "__len__") else None
+        }
+
+# Set SCHOOL_ENTITY_CACHE_SIZE=0 to disable caching
+ENTITY_CACHE_SIZE = int(os.getenv("SCHOOL_ENTITY_CACHE_SIZE", "10000"))
+# Invalidation only reaches this worker's entries, and a view read from a lagging
+# replica (or loaded just before a concurrent write) can be cached after it; the
+# TTL bounds how long such a view is served. 0 disables expiry.
+ENTITY_CACHE_TTL_SECONDS = float(os.getenv("SCHOOL_ENTITY_CACHE_TTL_SECONDS", "30"))
+entity_cache = EntityCache(
+    LRUBackend(ENTITY_CACHE_SIZE, ttl=ENTITY_CACHE_TTL_SECONDS or None),
+    enabled=ENTITY_CACHE_SIZE > 0
+)
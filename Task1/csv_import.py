@@ -0,0 +1,58 @@
+"""CSV row parsing shared by /upload-csv/ and background import jobs."""
+from schemas import StudentBase
+
+# Rows parsed and inserted per transaction
+CSV_IMPORT_CHUNK_SIZE = 1000
+
+REQUIRED_FIELDS = {'name', 'email'}  # Only 'name' and 'email' are strictly required
+OPTIONAL_FIELDS = {'subject_ids'}  # Optional fields
+
+def missing_columns(headers: set) -> set:
+    return REQUIRED_FIELDS - headers
+
+def parse_student_row(row: dict, headers: set) -> StudentBase:
+    subject_ids = []
+    if 'subject_ids' in headers and row.get('subject_ids'):
+        try:
+            subject_ids = [
+                int(id.strip())
+                for id in row['subject_ids'].replace('"', '').split(',')
+                if id.strip()
+            ]
+        except ValueError:
+            raise ValueError("Invalid subject_ids format. Expected comma-separated integers.")
+
+    return StudentBase(
+        name=row['name'],
+        email=row['email'],
+        subject_ids=subject_ids
+    )
+
+def parse_chunks(csv_reader, headers: set, chunk_size: int = CSV_IMPORT_CHUNK_SIZE, skip_rows: int = 0):
+    """Yield ``(chunk, failed, skipped, last_row)`` for every ``chunk_size`` valid rows.
+
+    ``chunk`` holds (row_number, row, student) ready for ``bulk_insert_students``,
+    ``failed`` and ``skipped`` hold (row_number, row, message) for rows that never
+    reach the database. ``last_row`` is the number of the last row read, so an
+    interrupted import can resume with ``skip_rows=last_row``.
+    """
+    chunk, failed, skipped = [], [], []
+    row_number = skip_rows
+    for row_number, row in enumerate(csv_reader, start=1):
+        if row_number <= skip_rows:
+            continue
+
+        if any(not row.get(field) for field in REQUIRED_FIELDS):
+            skipped.append((row_number, row, "Missing or empty required fields"))
+        else:
+            try:
+                chunk.append((row_number, row, parse_student_row(row, headers)))
+            except Exception as e:
+                failed.append((row_number, row, str(e)))
+
+        if len(chunk) >= chunk_size:
+            yield chunk, failed, skipped, row_number
+            chunk, failed, skipped = [], [], []
+
+    if chunk or failed or skipped:
+        yield chunk, failed, skipped, row_number
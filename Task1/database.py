@@ -1,15 +1,118 @@
-from sqlalchemy import create_engine
+import os
+from fastapi import Request
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from instrumentation import instrument_engine
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./school.db"
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+SQLALCHEMY_DATABASE_URL = os.getenv("SCHOOL_DATABASE_URL", "sqlite:///./school.db")
+# Optional replica used for GET requests; defaults to the primary
+SQLALCHEMY_READ_DATABASE_URL = os.getenv("SCHOOL_READ_DATABASE_URL", SQLALCHEMY_DATABASE_URL)
+
+POOL_SIZE = int(os.getenv("SCHOOL_DB_POOL_SIZE", "10"))
+MAX_OVERFLOW = int(os.getenv("SCHOOL_DB_MAX_OVERFLOW", "20"))
+POOL_PRE_PING = os.getenv("SCHOOL_DB_POOL_PRE_PING", "1").lower() in ("1", "true", "yes")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SCHOOL_SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+# Run migrations.upgrade when the app starts; turn off when migrating as a deploy step
+MIGRATE_ON_STARTUP = os.getenv("SCHOOL_MIGRATE_ON_STARTUP", "1").lower() in ("1", "true", "yes")
+
+# Set SCHOOL_DB_ASYNC=1 to serve requests through an AsyncSession (aiosqlite / asyncpg)
+USE_ASYNC_DB = os.getenv("SCHOOL_DB_ASYNC", "0").lower() in ("1", "true", "yes")
+
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+def to_async_url(url: str) -> str:
+    scheme, rest = url.split("://", 1)
+    dialect = scheme.split("+", 1)[0]
+    if dialect not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for '{dialect}' databases")
+    return f"{ASYNC_DRIVERS[dialect]}://{rest}"
+
+def is_sqlite(url: str) -> bool:
+    return url.startswith("sqlite")
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL lets readers proceed while a writer holds the lock; NORMAL sync is safe under WAL
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.close()
+
+def engine_options(url: str) -> dict:
+    options = {"pool_pre_ping": POOL_PRE_PING}
+    if not (is_sqlite(url) and ":memory:" in url):
+        options.update(pool_size=POOL_SIZE, max_overflow=MAX_OVERFLOW)
+    return options
+
+def make_engine(url: str):
+    engine = create_engine(url, **engine_options(url))
+    if is_sqlite(url):
+        event.listen(engine, "connect", set_sqlite_pragmas)
+    instrument_engine(engine)
+    return engine
+
+def make_async_engine(url: str):
+    engine = create_async_engine(to_async_url(url), **engine_options(url))
+    if is_sqlite(url):
+        event.listen(engine.sync_engine, "connect", set_sqlite_pragmas)
+    instrument_engine(engine.sync_engine)
+    return engine
+
+engine = make_engine(SQLALCHEMY_DATABASE_URL)
+read_engine = (
+    make_engine(SQLALCHEMY_READ_DATABASE_URL)
+    if SQLALCHEMY_READ_DATABASE_URL != SQLALCHEMY_DATABASE_URL else engine
+)
 SessionLocal = sessionmaker(bind=engine)
+ReadSessionLocal = sessionmaker(bind=read_engine)
 Base = declarative_base()
 
+if USE_ASYNC_DB:
+    async_engine = make_async_engine(SQLALCHEMY_DATABASE_URL)
+    async_read_engine = (
+        make_async_engine(SQLALCHEMY_READ_DATABASE_URL)
+        if SQLALCHEMY_READ_DATABASE_URL != SQLALCHEMY_DATABASE_URL else async_engine
+    )
+    AsyncSessionLocal = async_sessionmaker(bind=async_engine)
+    AsyncReadSessionLocal = async_sessionmaker(bind=async_read_engine)
+else:
+    async_engine = async_read_engine = None
+    AsyncSessionLocal = AsyncReadSessionLocal = None
+
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def get_routed_db(request: Request):
+    # GET handlers read from the replica engine, everything else writes to the primary
+    db = ReadSessionLocal() if request.method in ("GET", "HEAD") else SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_db(request: Request):
+    factory = AsyncReadSessionLocal if request.method in ("GET", "HEAD") else AsyncSessionLocal
+    async with factory() as db:
+        yield db
+
+get_session = get_async_db if USE_ASYNC_DB else get_routed_db
+
+async def run_in_session(db, method, *args):
+    """Call a sync ``*Operations`` method with either kind of session.
+
+    With an AsyncSession the method runs through ``run_sync``, so every query it
+    issues awaits the async driver instead of blocking the event loop.
+    """
+    if isinstance(db, AsyncSession):
+        return await db.run_sync(lambda session: method(session, *args))
+    return method(db, *args)
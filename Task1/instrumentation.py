@@ -0,0 +1,142 @@
+"""Per-request SQL instrumentation.
+
+Engine event hooks time every statement and attribute it to the request being
+served (tracked through a context variable). The middleware turns the totals
+into a Server-Timing header, folds them into per-route metrics for
+/debug/metrics, and logs a warning when one statement shape repeats more than
+NPLUS1_THRESHOLD times in a single request - the signature of an N+1 loop.
+"""
+import heapq
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+from fastapi import Request
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+NPLUS1_THRESHOLD = int(os.getenv("SCHOOL_NPLUS1_THRESHOLD", "10"))
+SLOWEST_KEPT = 5
+
+# Requests are keyed by method and route template; anything the client controls
+# (unknown paths and methods) collapses into one key so the registry stays bounded
+UNMATCHED_ROUTE = "<unmatched>"
+KNOWN_METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+
+# Expanded IN lists and literal numbers would make every call a different shape
+IN_LIST = re.compile(r"\((?:\s*\?\s*,)+\s*\?\s*\)")
+NUMBER = re.compile(r"\b\d+\b")
+
+def statement_shape(statement: str) -> str:
+    return NUMBER.sub("?", IN_LIST.sub("(?)", " ".join(statement.split())))
+
+class RequestStats:
+    def __init__(self):
+        self.statements = 0
+        self.db_time = 0.0
+        self.shapes = Counter()
+        self.slowest = []
+
+    def record(self, statement: str, duration: float):
+        self.statements += 1
+        self.db_time += duration
+        self.shapes[statement_shape(statement)] += 1
+        entry = (duration, statement)
+        if len(self.slowest) < SLOWEST_KEPT:
+            heapq.heappush(self.slowest, entry)
+        else:
+            heapq.heappushpop(self.slowest, entry)
+
+    def repeated_shapes(self, threshold: int):
+        return [(shape, count) for shape, count in self.shapes.items() if count > threshold]
+
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+class MetricsRegistry:
+    """Totals per route since the process started."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+        self._slowest = []
+
+    def add(self, route: str, stats: RequestStats, elapsed: float, repeated: list):
+        with self._lock:
+            metrics = self._routes.setdefault(route, {
+                "requests": 0, "statements": 0, "max_statements": 0,
+                "db_time_ms": 0.0, "total_time_ms": 0.0, "nplus1_warnings": 0
+            })
+            metrics["requests"] += 1
+            metrics["statements"] += stats.statements
+            metrics["max_statements"] = max(metrics["max_statements"], stats.statements)
+            metrics["db_time_ms"] += stats.db_time * 1000
+            metrics["total_time_ms"] += elapsed * 1000
+            metrics["nplus1_warnings"] += bool(repeated)
+            for duration, statement in stats.slowest:
+                entry = (duration, statement, route)
+                if len(self._slowest) < SLOWEST_KEPT * 2:
+                    heapq.heappush(self._slowest, entry)
+                else:
+                    heapq.heappushpop(self._slowest, entry)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            routes = {
+                route: dict(
+                    metrics,
+                    avg_statements=metrics["statements"] / metrics["requests"],
+                    avg_db_time_ms=metrics["db_time_ms"] / metrics["requests"],
+                    avg_total_time_ms=metrics["total_time_ms"] / metrics["requests"]
+                )
+                for route, metrics in self._routes.items()
+            }
+            slowest = [
+                {"duration_ms": duration * 1000, "route": route, "statement": statement}
+                for duration, statement, route in sorted(self._slowest, reverse=True)
+            ]
+        return {"routes": routes, "slowest_statements": slowest, "nplus1_threshold": NPLUS1_THRESHOLD}
+
+metrics_registry = MetricsRegistry()
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - conn.info["query_start"].pop()
+    stats = current_request.get()
+    if stats is not None:
+        stats.record(statement, duration)
+
+def instrument_engine(engine):
+    if not event.contains(engine, "before_cursor_execute", before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", after_cursor_execute)
+
+async def sql_metrics_middleware(request: Request, call_next):
+    stats = RequestStats()
+    token = current_request.set(stats)
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        current_request.reset(token)
+    elapsed = time.perf_counter() - started
+
+    route = request.scope.get("route")
+    method = request.method if request.method in KNOWN_METHODS else "OTHER"
+    route_name = f"{method} {route.path if route else UNMATCHED_ROUTE}"
+    repeated = stats.repeated_shapes(NPLUS1_THRESHOLD)
+    for shape, count in repeated:
+        logger.warning(f"Possible N+1 in {route_name}: statement ran {count} times: {shape[:200]}")
+    metrics_registry.add(route_name, stats, elapsed, repeated)
+
+    response.headers["Server-Timing"] = (
+        f'db;dur={stats.db_time * 1000:.2f};desc="{stats.statements} queries", '
+        f"app;dur={elapsed * 1000:.2f}"
+    )
+    return response
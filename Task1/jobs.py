@@ -0,0 +1,370 @@
+"""Background CSV import jobs.
+
+``/upload-csv/?background=true`` spools the upload to SPOOL_DIR and returns a
+job id straight away. A fixed pool of worker threads imports the file
+CSV_IMPORT_CHUNK_SIZE rows per transaction, recording progress and per-row
+errors after every chunk. Job state lives in its own SQLite database, so queued
+and interrupted jobs are picked up again on the next start; an interrupted job
+resumes after the last recorded row.
+
+Several app processes can share one jobs database. A worker claims a job
+with a conditional UPDATE before importing it and refreshes a heartbeat after
+every chunk; other processes only take over a running job once its heartbeat
+is older than JOB_LEASE_SECONDS. Every JOB_SWEEP_SECONDS each process looks for
+claimable jobs again, so a job left running by a worker that crashed (even one
+restarted within the lease) is picked up once its lease runs out.
+"""
+import csv
+import io
+import json
+import logging
+import os
+import shutil
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from fastapi import HTTPException
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Text, and_, func, inspect, or_, text, update
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.declarative import declarative_base
+from database import SessionLocal, make_engine
+from csv_import import CSV_IMPORT_CHUNK_SIZE, missing_columns, parse_chunks
+from operations import StudentOperations
+
+logger = logging.getLogger(__name__)
+
+JOBS_DATABASE_URL = os.getenv("SCHOOL_JOBS_DATABASE_URL", "sqlite:///./jobs.db")
+SPOOL_DIR = os.getenv("SCHOOL_JOBS_SPOOL_DIR", "./uploads")
+JOB_WORKERS = int(os.getenv("SCHOOL_JOB_WORKERS", "2"))
+# Uploads waiting for a worker before new ones are turned away
+MAX_QUEUED_JOBS = int(os.getenv("SCHOOL_MAX_QUEUED_JOBS", "20"))
+# A running job whose heartbeat is older than this is considered abandoned
+JOB_LEASE_SECONDS = int(os.getenv("SCHOOL_JOB_LEASE_SECONDS", "60"))
+# How often each process looks for queued or abandoned jobs to resume
+JOB_SWEEP_SECONDS = float(os.getenv("SCHOOL_JOB_SWEEP_SECONDS", "15"))
+
+QUEUED, RUNNING, COMPLETED, FAILED = "queued", "running", "completed", "failed"
+
+JobsBase = declarative_base()
+
+class ImportJob(JobsBase):
+    __tablename__ = "import_jobs"
+
+    id = Column(String, primary_key=True)
+    status = Column(String, nullable=False, index=True)
+    filename = Column(String, nullable=False)
+    spool_path = Column(String, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    bytes_total = Column(Integer, nullable=False)
+    bytes_processed = Column(Integer, nullable=False, default=0)
+    rows_processed = Column(Integer, nullable=False, default=0)
+    successful = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    skipped = Column(Integer, nullable=False, default=0)
+    error = Column(String)
+    claim_token = Column(String)  # Set by the worker currently importing the job
+    heartbeat_at = Column(DateTime)
+
+class ImportJobError(JobsBase):
+    __tablename__ = "import_job_errors"
+
+    id = Column(Integer, primary_key=True)
+    job_id = Column(String, ForeignKey("import_jobs.id"), nullable=False, index=True)
+    row_number = Column(Integer, nullable=False)
+    kind = Column(String, nullable=False)  # "failed" or "skipped"
+    message = Column(String, nullable=False)
+    row = Column(Text, nullable=False)
+
+class LeaseLost(Exception):
+    """Another worker claimed the job after this worker's heartbeat expired."""
+
+class ImportJobQueue:
+    def __init__(self, url: str = JOBS_DATABASE_URL, spool_dir: str = SPOOL_DIR,
+                 workers: int = JOB_WORKERS, max_queued: int = MAX_QUEUED_JOBS,
+                 lease_seconds: int = JOB_LEASE_SECONDS, sweep_seconds: float = JOB_SWEEP_SECONDS):
+        self.url = url
+        self.spool_dir = spool_dir
+        self.workers = workers
+        self.max_queued = max_queued
+        self.lease = timedelta(seconds=lease_seconds)
+        self.sweep_seconds = sweep_seconds
+        self.student_ops = StudentOperations()
+        self.JobSession = None
+        self.executor = None
+        self.sweeper = None
+        self.stopped = threading.Event()
+        # Jobs handed to this process's executor that have not finished running yet
+        self.submitted = set()
+        self.submitted_lock = threading.Lock()
+
+    def start(self):
+        """Create the job tables, requeue queued and abandoned jobs and keep sweeping for them."""
+        engine = make_engine(self.url)
+        JobsBase.metadata.create_all(bind=engine)
+        self.add_lease_columns(engine)
+        self.JobSession = sessionmaker(bind=engine)
+        self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="csv-import")
+        os.makedirs(self.spool_dir, exist_ok=True)
+
+        self.stopped.clear()
+        self.requeue()
+        self.sweeper = threading.Thread(target=self.sweep, name="csv-import-sweep", daemon=True)
+        self.sweeper.start()
+
+    def requeue(self):
+        """Submit every claimable job this process is not already holding."""
+        # Other processes may pick the same jobs; run() only imports the ones it claims
+        with self.JobSession() as db:
+            pending = (
+                db.query(ImportJob.id, ImportJob.status, ImportJob.rows_processed)
+                .filter(self.claimable())
+                .order_by(ImportJob.created_at)
+                .all()
+            )
+        for job_id, status, rows_processed in pending:
+            with self.submitted_lock:
+                if job_id in self.submitted:
+                    continue
+            if status == RUNNING:
+                logger.info(f"Resuming import job {job_id} after row {rows_processed}")
+            self.enqueue(job_id)
+
+    def sweep(self):
+        # A job whose worker died inside its lease only becomes claimable once the lease runs out
+        while not self.stopped.wait(self.sweep_seconds):
+            try:
+                self.requeue()
+            except Exception:
+                logger.exception("Sweeping for import jobs failed")
+
+    def enqueue(self, job_id: str):
+        executor = self.executor
+        if executor is None:  # shut down while sweeping
+            return
+        with self.submitted_lock:
+            self.submitted.add(job_id)
+        executor.submit(self.run, job_id)
+
+    def add_lease_columns(self, engine):
+        # jobs.db files created before leases existed
+        columns = {column["name"] for column in inspect(engine).get_columns(ImportJob.__tablename__)}
+        with engine.begin() as connection:
+            for name in ("claim_token", "heartbeat_at"):
+                if name not in columns:
+                    column_type = ImportJob.__table__.c[name].type.compile(engine.dialect)
+                    connection.execute(text(f"ALTER TABLE import_jobs ADD COLUMN {name} {column_type}"))
+
+    def claimable(self):
+        """Queued jobs, and running jobs whose worker stopped sending heartbeats."""
+        expired = datetime.utcnow() - self.lease
+        return or_(
+            ImportJob.status == QUEUED,
+            and_(
+                ImportJob.status == RUNNING,
+                or_(ImportJob.heartbeat_at.is_(None), ImportJob.heartbeat_at < expired)
+            )
+        )
+
+    def claim(self, job_id: str):
+        """Atomically take ``job_id`` for this worker; returns the claim token, or None if it is taken."""
+        token = uuid.uuid4().hex
+        now = datetime.utcnow()
+        with self.JobSession() as db:
+            claimed = db.execute(
+                update(ImportJob)
+                .where(ImportJob.id == job_id, self.claimable())
+                .values(
+                    status=RUNNING,
+                    claim_token=token,
+                    heartbeat_at=now,
+                    started_at=func.coalesce(ImportJob.started_at, now)
+                )
+            ).rowcount
+            db.commit()
+        return token if claimed == 1 else None
+
+    def shutdown(self):
+        # Running jobs stop with the process and resume from their last chunk on restart
+        self.stopped.set()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def submit(self, upload, filename: str) -> dict:
+        """Spool an uploaded CSV file object to disk and queue it for import."""
+        with self.JobSession() as db:
+            queued = db.query(func.count(ImportJob.id)).filter(ImportJob.status == QUEUED).scalar()
+        if queued >= self.max_queued:
+            raise HTTPException(status_code=503, detail="Too many import jobs queued, try again later")
+
+        job_id = uuid.uuid4().hex
+        spool_path = os.path.join(self.spool_dir, f"{job_id}.csv")
+        with open(spool_path, "wb") as spool:
+            shutil.copyfileobj(upload, spool, length=1024 * 1024)
+
+        try:
+            self.check_headers(spool_path)
+        except HTTPException:
+            os.remove(spool_path)
+            raise
+
+        job = ImportJob(
+            id=job_id,
+            status=QUEUED,
+            filename=filename,
+            spool_path=spool_path,
+            created_at=datetime.utcnow(),
+            bytes_total=os.path.getsize(spool_path),
+            bytes_processed=0,
+            rows_processed=0,
+            successful=0,
+            failed=0,
+            skipped=0
+        )
+        with self.JobSession() as db:
+            db.add(job)
+            db.commit()
+        self.enqueue(job_id)
+        return self.get_job(job_id, errors_limit=0)
+
+    def check_headers(self, spool_path: str):
+        if os.path.getsize(spool_path) == 0:
+            raise HTTPException(status_code=400, detail="File is empty")
+        try:
+            with open(spool_path, encoding="utf-8", newline="") as spooled:
+                headers = set(next(csv.reader(spooled), []))
+        except UnicodeDecodeError:
+            raise HTTPException(
+                status_code=400,
+                detail="File is not properly encoded. Please ensure it's saved as UTF-8"
+            )
+        missing_required_fields = missing_columns(headers)
+        if missing_required_fields:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Missing required columns: {', '.join(missing_required_fields)}"
+            )
+
+    def get_job(self, job_id: str, errors_offset: int = 0, errors_limit: int = 100) -> dict:
+        with self.JobSession() as db:
+            job = db.get(ImportJob, job_id)
+            if not job:
+                raise HTTPException(status_code=404, detail="Job not found")
+            errors = (
+                db.query(ImportJobError)
+                .filter(ImportJobError.job_id == job_id)
+                .order_by(ImportJobError.row_number)
+                .offset(errors_offset)
+                .limit(errors_limit)
+                .all()
+            )
+            return {
+                "id": job.id,
+                "status": job.status,
+                "filename": job.filename,
+                "created_at": job.created_at,
+                "started_at": job.started_at,
+                "finished_at": job.finished_at,
+                "bytes_total": job.bytes_total,
+                "bytes_processed": job.bytes_processed,
+                "progress": job.bytes_processed / job.bytes_total if job.bytes_total else 1.0,
+                "rows_processed": job.rows_processed,
+                "successful": job.successful,
+                "failed": job.failed,
+                "skipped": job.skipped,
+                "error": job.error,
+                "errors": [
+                    {
+                        "row_number": error.row_number,
+                        "kind": error.kind,
+                        "row": json.loads(error.row),
+                        "message": error.message
+                    }
+                    for error in errors
+                ]
+            }
+
+    def run(self, job_id: str):
+        try:
+            self.import_job(job_id)
+        finally:
+            with self.submitted_lock:
+                self.submitted.discard(job_id)
+
+    def import_job(self, job_id: str):
+        token = self.claim(job_id)
+        if token is None:
+            return
+        with self.JobSession() as jobs_db:
+            job = jobs_db.get(ImportJob, job_id)
+            spool_path, skip_rows = job.spool_path, job.rows_processed
+
+        try:
+            with open(spool_path, "rb") as raw, SessionLocal() as db:
+                csv_reader = csv.DictReader(io.TextIOWrapper(raw, encoding="utf-8", newline=""))
+                headers = set(csv_reader.fieldnames) if csv_reader.fieldnames else set()
+                for chunk, failed, skipped, last_row in parse_chunks(
+                    csv_reader, headers, CSV_IMPORT_CHUNK_SIZE, skip_rows
+                ):
+                    successful, insert_failed = self.student_ops.bulk_insert_students(
+                        db, [(row_number, student_data) for row_number, _, student_data in chunk]
+                    ) if chunk else ([], [])
+                    rows = {row_number: row for row_number, row, _ in chunk}
+                    failed.extend((row_number, rows[row_number], error) for row_number, error in insert_failed)
+                    self.record_chunk(job_id, token, last_row, raw.tell(), len(successful), failed, skipped)
+        except LeaseLost:
+            logger.warning(f"Import job {job_id} was taken over by another worker")
+        except UnicodeDecodeError:
+            self.finish(job_id, token, FAILED, "File is not properly encoded. Please ensure it's saved as UTF-8")
+        except Exception as e:
+            logger.exception(f"Import job {job_id} failed")
+            self.finish(job_id, token, FAILED, f"Error processing CSV file: {str(e)}")
+        else:
+            self.finish(job_id, token, COMPLETED)
+
+    def record_chunk(self, job_id: str, token: str, last_row: int, bytes_processed: int,
+                     successful: int, failed: list, skipped: list):
+        """Record a chunk's progress and errors and renew the lease, unless another worker has claimed the job."""
+        with self.JobSession() as db:
+            recorded = db.execute(
+                update(ImportJob)
+                .where(ImportJob.id == job_id, ImportJob.claim_token == token)
+                .values(
+                    rows_processed=last_row,
+                    bytes_processed=bytes_processed,
+                    successful=ImportJob.successful + successful,
+                    failed=ImportJob.failed + len(failed),
+                    skipped=ImportJob.skipped + len(skipped),
+                    heartbeat_at=datetime.utcnow()
+                )
+            ).rowcount
+            if recorded != 1:
+                db.rollback()
+                raise LeaseLost(job_id)
+            db.add_all(
+                ImportJobError(job_id=job_id, row_number=row_number, kind=kind, message=message, row=json.dumps(row))
+                for kind, entries in (("failed", failed), ("skipped", skipped))
+                for row_number, row, message in entries
+            )
+            db.commit()
+
+    def finish(self, job_id: str, token: str, status: str, error: str = None):
+        with self.JobSession() as db:
+            job = db.get(ImportJob, job_id)
+            if job.claim_token != token:
+                logger.warning(f"Import job {job_id} was taken over by another worker")
+                return
+            job.status = status
+            job.error = error
+            job.finished_at = datetime.utcnow()
+            if status == COMPLETED:
+                job.bytes_processed = job.bytes_total
+            spool_path = job.spool_path
+            db.commit()
+        if os.path.exists(spool_path):
+            os.remove(spool_path)
+
+job_queue = ImportJobQueue()
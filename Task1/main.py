@@ -1,161 +1,414 @@
-from fastapi import FastAPI, UploadFile, File, Depends, HTTPException, Query
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, UploadFile, File, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, ORJSONResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from database import engine, get_db, Base
-from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import engine, get_session, run_in_session, MIGRATE_ON_STARTUP
+from typing import List, Optional
 import csv
-from io import StringIO
-from schemas import StudentBase, TeacherBase, SubjectBase, TeacherPatchSchema, StudentPatchSchema
-from operations import StudentOperations, TeacherOperations, SubjectOperations
+import io
+from schemas import (
+    StudentBase, TeacherBase, SubjectBase, TeacherPatchSchema, StudentPatchSchema,
+    StudentEnrollmentSchema, TeacherAssignmentSchema,
+    StudentOut, TeacherOut, SubjectRef, SubjectSummary, Page, Batch, BatchRequest, RosterPage,
+    StudentCreated, TeacherCreated, StudentEnrollmentResult, TeacherAssignmentResult,
+    SubjectEnrollmentStats, SubjectHistogram, SearchPage, CacheStats, SqlMetrics, CsvImportResponse, ImportJobStatus
+)
+from operations import StudentOperations, TeacherOperations, SubjectOperations, SearchOperations
+from migrations import upgrade
+from cache import entity_cache
+from csv_import import CSV_IMPORT_CHUNK_SIZE, missing_columns, parse_chunks
+from instrumentation import metrics_registry, sql_metrics_middleware
+from jobs import job_queue
+from batching import group_committer
 
-app = FastAPI()
+# orjson renders responses much faster than the stdlib json encoder
+app = FastAPI(default_response_class=ORJSONResponse)
 student_ops = StudentOperations()
 teacher_ops = TeacherOperations()
 subject_ops = SubjectOperations()
+search_ops = SearchOperations()
 
-# Create tables
-Base.metadata.create_all(bind=engine)
+# Statement counts and DB time per request: Server-Timing header and /debug/metrics
+app.middleware("http")(sql_metrics_middleware)
 
-@app.get("/students/")
+@app.on_event("startup")
+def migrate_database():
+    # Create tables and bring databases from older versions up to date. Deployments
+    # that run `python migrations.py` beforehand set SCHOOL_MIGRATE_ON_STARTUP=0
+    if MIGRATE_ON_STARTUP:
+        upgrade(engine)
+
+@app.on_event("startup")
+def start_import_jobs():
+    job_queue.start()
+
+@app.on_event("shutdown")
+def stop_import_jobs():
+    job_queue.shutdown()
+
+@app.get("/students/", response_model=Page[StudentOut])
 async def get_students(
     page: int = Query(default=1, ge=1, description="Page number"),
     page_size: int = Query(default=10, ge=1, le=100, description="Items per page"),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(default=None, description="Opaque cursor from a previous page's next_cursor"),
+    include_total: bool = Query(default=True, description="Include the (cached) total row count"),
+    db: Session = Depends(get_session)
+):
+    return await run_in_session(db, student_ops.get_students, page, page_size, cursor, include_total)
+
+@app.get("/students/export")
+async def export_students(
+    format: str = Query(default="csv", pattern="^(csv|ndjson)$", description="csv or ndjson"),
+    db: Session = Depends(get_session)
+):
+    return export_response(db, student_ops, format, "students")
+
+# Batch lookup: ?ids=1,2,3 or a POST body, answered with a fixed number of IN queries
+@app.get("/students/batch", response_model=Batch[StudentOut])
+async def get_students_batch(
+    ids: str = Query(..., description="Comma-separated student ids"),
+    db: Session = Depends(get_session)
 ):
-    return student_ops.get_students(db, page, page_size)
+    return await run_in_session(db, student_ops.get_students_batch, student_ops.parse_ids(ids))
 
-@app.get("/students/{student_id}")
+@app.post("/students/batch", response_model=Batch[StudentOut])
+async def post_students_batch(
+    batch: BatchRequest,
+    db: Session = Depends(get_session)
+):
+    return await run_in_session(db, student_ops.get_students_batch, batch.ids)
+
+@app.get("/students/{student_id}", response_model=StudentOut)
 async def get_student(
     student_id: int,
-    db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_session)
 ):
-    return student_ops.get_student_data(db, student_id)
+    not_modified = await not_modified_response(request, db, student_ops, "student", student_id)
+    if not_modified:
+        return not_modified
+    student = await run_in_session(db, student_ops.get_student_data, student_id)
+    response.headers["ETag"] = entity_etag("student", student_id, student.version)
+    return student
 
-@app.post("/students/")
+@app.post("/students/", response_model=StudentCreated)
 async def create_student(
     student: StudentBase,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_session)
 ):
-    return student_ops.insert_student(db, student)
+    if group_committer.enabled:
+        return await group_committer.submit(student_ops.insert_students_batch, student)
+    return await run_in_session(db, student_ops.insert_student, student)
 
-@app.put("/students/{student_id}")
+@app.put("/students/{student_id}", response_model=StudentOut)
 async def update_student(
     student_id: int,
     student: StudentBase,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_session)
 ):
-    return student_ops.update_student(db, student_id, student.dict())
+    return await run_in_session(db, student_ops.update_student, student_id, student.dict())
 
-@app.patch("/students/{student_id}")
+@app.patch("/students/{student_id}", response_model=StudentOut)
 async def patch_student(
     student_id: int,
     student: StudentPatchSchema,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_session)
 ):
     update_data = {k: v for k, v in student.dict().items() if v is not None}
-    return student_ops.update_student(db, student_id, update_data)
+    return await run_in_session(db, student_ops.update_student, student_id, update_data)
+
+@app.post("/students/subjects", response_model=StudentEnrollmentResult)
+async def enroll_students(
+    enrollment: StudentEnrollmentSchema,
+    db: Session = Depends(get_session)
+):
+    return await run_in_session(db, student_ops.enroll_students, enrollment.student_ids, enrollment.subject_ids)
 
-@app.delete("/students/{student_id}/subjects/{subject_id}")
+@app.delete("/students/{student_id}/subjects/{subject_id}", response_model=StudentOut)
 async def remove_subject_from_student(
     student_id: int,
     subject_id: int,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_session)
 ):
-    return student_ops.remove_subject_student(db, student_id, subject_id)
+    return await run_in_session(db, student_ops.remove_subject_student, student_id, subject_id)
 
 # Teacher routes
-@app.get("/teachers/")
+@app.get("/teachers/", response_model=Page[TeacherOut])
 async def get_teachers(
     page: int = 1,
     page_size: int = 10,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+    db: Session = Depends(get_session)
+):
+    return await run_in_session(db, teacher_ops.get_teachers, page, page_size, cursor, include_total)
+
+@app.get("/teachers/export")
+async def export_teachers(
+    format: str = Query(default="csv", pattern="^(csv|ndjson)$", description="csv or ndjson"),
+    db: Session = Depends(get_session)
+):
+    return export_response(db, teacher_ops, format, "teachers")
+
+@app.get("/teachers/batch", response_model=Batch[TeacherOut])
+async def get_teachers_batch(
+    ids: str = Query(..., description="Comma-separated teacher ids"),
+    db: Session = Depends(get_session)
 ):
-    return teacher_ops.get_teachers(db, page, page_size)
+    return await run_in_session(db, teacher_ops.get_teachers_batch, teacher_ops.parse_ids(ids))
 
-@app.get("/teachers/{teacher_id}")
+@app.post("/teachers/batch", response_model=Batch[TeacherOut])
+async def post_teachers_batch(
+    batch: BatchRequest,
+    db: Session = Depends(get_session)
+):
+    return await run_in_session(db, teacher_ops.get_teachers_batch, batch.ids)
+
+@app.get("/teachers/{teacher_id}", response_model=TeacherOut)
 async def get_teacher(
     teacher_id: int,
-    db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_session)
 ):
-    return teacher_ops.get_teacher_data(db, teacher_id)
+    not_modified = await not_modified_response(request, db, teacher_ops, "teacher", teacher_id)
+    if not_modified:
+        return not_modified
+    teacher = await run_in_session(db, teacher_ops.get_teacher_data, teacher_id)
+    response.headers["ETag"] = entity_etag("teacher", teacher_id, teacher.version)
+    return teacher
 
-@app.post("/teachers/")
+@app.post("/teachers/", response_model=TeacherCreated)
 async def create_teacher(
     teacher: TeacherBase,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_session)
 ):
-    return teacher_ops.insert_teacher(db, teacher)
+    if group_committer.enabled:
+        return await group_committer.submit(teacher_ops.insert_teachers_batch, teacher)
+    return await run_in_session(db, teacher_ops.insert_teacher, teacher)
 
-@app.put("/teachers/{teacher_id}")
+@app.put("/teachers/{teacher_id}", response_model=TeacherOut)
 async def update_teacher(
     teacher_id: int,
     teacher: TeacherBase,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_session)
 ):
-    return teacher_ops.update_teacher(db, teacher_id, teacher.dict())
+    return await run_in_session(db, teacher_ops.update_teacher, teacher_id, teacher.dict())
 
-@app.patch("/teachers/{teacher_id}")
+@app.patch("/teachers/{teacher_id}", response_model=TeacherOut)
 async def patch_teacher(
     teacher_id: int,
     teacher: TeacherPatchSchema,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_session)
 ):
     update_data = {k: v for k, v in teacher.dict().items() if v is not None}
-    return teacher_ops.update_teacher(db, teacher_id, update_data)
+    return await run_in_session(db, teacher_ops.update_teacher, teacher_id, update_data)
+
+@app.post("/teachers/subjects", response_model=TeacherAssignmentResult)
+async def assign_teachers(
+    assignment: TeacherAssignmentSchema,
+    db: Session = Depends(get_session)
+):
+    return await run_in_session(db, teacher_ops.assign_teachers, assignment.teacher_ids, assignment.subject_ids)
 
-@app.delete("/teachers/{teacher_id}/subjects/{subject_id}")
+@app.delete("/teachers/{teacher_id}/subjects/{subject_id}", response_model=TeacherOut)
 async def remove_subject_from_teacher(
     teacher_id: int,
     subject_id: int,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_session)
 ):
-    return teacher_ops.remove_subject_teacher(db, teacher_id, subject_id)
+    return await run_in_session(db, teacher_ops.remove_subject_teacher, teacher_id, subject_id)
 
 # Subject routes
-@app.get("/subjects/")
+@app.get("/subjects/", response_model=Page[SubjectSummary])
 async def get_subjects(
     page: int = 1,
     page_size: int = 10,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+    db: Session = Depends(get_session)
+):
+    return await run_in_session(db, subject_ops.get_subjects, page, page_size, cursor, include_total)
+
+@app.get("/subjects/batch", response_model=Batch[SubjectSummary])
+async def get_subjects_batch(
+    ids: str = Query(..., description="Comma-separated subject ids"),
+    db: Session = Depends(get_session)
+):
+    return await run_in_session(db, subject_ops.get_subjects_batch, subject_ops.parse_ids(ids))
+
+@app.post("/subjects/batch", response_model=Batch[SubjectSummary])
+async def post_subjects_batch(
+    batch: BatchRequest,
+    db: Session = Depends(get_session)
 ):
-    return subject_ops.get_subjects(db, page, page_size)
+    return await run_in_session(db, subject_ops.get_subjects_batch, batch.ids)
 
-@app.get("/subjects/{subject_id}")
+@app.get("/subjects/{subject_id}", response_model=SubjectSummary)
 async def get_subject(
     subject_id: int,
-    db: Session = Depends(get_db)
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_session)
 ):
-    return subject_ops.get_subject_data(db, subject_id)
+    not_modified = await not_modified_response(request, db, subject_ops, "subject", subject_id)
+    if not_modified:
+        return not_modified
+    subject = await run_in_session(db, subject_ops.get_subject_data, subject_id)
+    response.headers["ETag"] = entity_etag("subject", subject_id, subject.version)
+    return subject
 
-@app.post("/subjects/")
+@app.post("/subjects/", response_model=SubjectRef)
 async def create_subject(
     subject: SubjectBase,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_session)
 ):
-    return subject_ops.insert_subject(db, subject.name)
+    return await run_in_session(db, subject_ops.insert_subject, subject.name)
 
-@app.put("/subjects/{subject_id}")
+@app.put("/subjects/{subject_id}", response_model=SubjectSummary)
 async def update_subject(
     subject_id: int,
     subject: SubjectBase,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_session)
 ):
-    return subject_ops.update_subject(db, subject_id, subject.dict())
+    return await run_in_session(db, subject_ops.update_subject, subject_id, subject.dict())
 
-@app.patch("/subjects/{subject_id}")
+@app.patch("/subjects/{subject_id}", response_model=SubjectSummary)
 async def patch_subject(
     subject_id: int,
     subject: SubjectBase,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_session)
 ):
     update_data = {k: v for k, v in subject.dict().items() if v is not None}
-    return subject_ops.update_subject(db, subject_id, update_data)
+    return await run_in_session(db, subject_ops.update_subject, subject_id, update_data)
+
+@app.get("/subjects/{subject_id}/students", response_model=RosterPage)
+async def get_subject_students(
+    subject_id: int,
+    cursor: Optional[str] = None,
+    page_size: int = Query(default=10, ge=1, le=100),
+    stream: bool = Query(default=False, description="Stream the full roster as NDJSON"),
+    db: Session = Depends(get_session)
+):
+    return await subject_roster_response(db, subject_id, "students", cursor, page_size, stream)
+
+@app.get("/subjects/{subject_id}/teachers", response_model=RosterPage)
+async def get_subject_teachers(
+    subject_id: int,
+    cursor: Optional[str] = None,
+    page_size: int = Query(default=10, ge=1, le=100),
+    stream: bool = Query(default=False, description="Stream the full roster as NDJSON"),
+    db: Session = Depends(get_session)
+):
+    return await subject_roster_response(db, subject_id, "teachers", cursor, page_size, stream)
+
+def entity_etag(kind: str, entity_id: int, version: int) -> str:
+    return f'"{kind}-{entity_id}-{version}"'
+
+async def not_modified_response(request: Request, db, ops, kind: str, entity_id: int) -> Optional[Response]:
+    # Answer If-None-Match from the version column alone, before any relationship is loaded
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return None
+    version = await run_in_session(db, ops.get_version, kind, entity_id)
+    etag = entity_etag(kind, entity_id, version)
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    if etag in candidates or "*" in candidates:
+        return Response(status_code=304, headers={"ETag": etag})
+    return None
+
+async def subject_roster_response(db, subject_id: int, roster: str, cursor: Optional[str], page_size: int, stream: bool):
+    if not stream:
+        return await run_in_session(db, subject_ops.get_subject_roster, subject_id, roster, cursor, page_size)
+
+    await run_in_session(db, subject_ops.ensure_subject_exists, subject_id)
+    if isinstance(db, AsyncSession):
+        rows = subject_ops.stream_subject_roster_async(db, subject_id, roster)
+    else:
+        rows = subject_ops.stream_subject_roster(db, subject_id, roster)
+    return StreamingResponse(rows, media_type="application/x-ndjson")
+
+def export_response(db, ops, export_format: str, name: str):
+    if isinstance(db, AsyncSession):
+        content = ops.stream_export_async(db, export_format)
+    else:
+        content = ops.stream_export(db, export_format)
+
+    if export_format == "csv":
+        return StreamingResponse(
+            content,
+            media_type="text/csv",
+            headers={"Content-Disposition": f'attachment; filename="{name}.csv"'}
+        )
+    return StreamingResponse(content, media_type="application/x-ndjson")
+
+# Search
+@app.get("/search", response_model=SearchPage)
+async def search(
+    q: str = Query(..., min_length=1, description="Name or email fragment"),
+    type: Optional[str] = Query(default=None, pattern="^(student|teacher)$"),
+    page: int = Query(default=1, ge=1),
+    page_size: int = Query(default=10, ge=1, le=100),
+    db: Session = Depends(get_session)
+):
+    return await run_in_session(db, search_ops.search, q, type, page, page_size)
+
+# Enrollment statistics, aggregated in SQL
+@app.get("/stats/subjects", response_model=Page[SubjectEnrollmentStats])
+async def get_enrollment_stats(
+    page: int = Query(default=1, ge=1),
+    page_size: int = Query(default=10, ge=1, le=100),
+    db: Session = Depends(get_session)
+):
+    return await run_in_session(db, subject_ops.get_enrollment_stats, page, page_size)
+
+@app.get("/stats/subjects/top", response_model=List[SubjectEnrollmentStats])
+async def get_top_subjects(
+    limit: int = Query(default=10, ge=1, le=100),
+    by: str = Query(default="students", pattern="^(students|teachers)$"),
+    db: Session = Depends(get_session)
+):
+    return await run_in_session(db, subject_ops.get_top_subjects, limit, by)
+
+@app.get("/stats/students/subjects", response_model=SubjectHistogram)
+async def get_student_subject_histogram(db: Session = Depends(get_session)):
+    return await run_in_session(db, student_ops.get_subject_histogram)
+
+@app.get("/stats/teachers/subjects", response_model=SubjectHistogram)
+async def get_teacher_subject_histogram(db: Session = Depends(get_session)):
+    return await run_in_session(db, teacher_ops.get_subject_histogram)
+
+# Entity cache statistics
+@app.get("/debug/cache", response_model=CacheStats)
+async def get_cache_stats():
+    return entity_cache.stats()
+
+# Progress and row errors of a background CSV import
+@app.get("/jobs/{job_id}", response_model=ImportJobStatus)
+async def get_import_job(
+    job_id: str,
+    errors_offset: int = Query(default=0, ge=0),
+    errors_limit: int = Query(default=100, ge=0, le=1000)
+):
+    return await run_in_threadpool(job_queue.get_job, job_id, errors_offset, errors_limit)
+
+# SQL statements and DB time per route since startup
+@app.get("/debug/metrics", response_model=SqlMetrics)
+async def get_sql_metrics():
+    return metrics_registry.snapshot()
 
 #CSV Upload
-@app.post("/upload-csv/")
+@app.post(
+    "/upload-csv/",
+    response_model=CsvImportResponse,
+    responses={202: {"model": ImportJobStatus, "description": "Import queued as a background job"}}
+)
 async def upload_csv(
     file: UploadFile = File(...),
-    db: Session = Depends(get_db)
+    background: bool = Query(default=False, description="Import in a background job and poll /jobs/{job_id}"),
+    db: Session = Depends(get_session)
 ):
     if not file.filename.endswith('.csv'):
         raise HTTPException(
@@ -163,23 +416,28 @@ async def upload_csv(
             detail="Uploaded file must be a CSV file"
         )
 
-    content = await file.read()
-    if not content:
+    if background:
+        job = await run_in_threadpool(job_queue.submit, file.file, file.filename)
+        return ORJSONResponse(
+            status_code=202,
+            content=ImportJobStatus.model_validate(job).model_dump(mode="json"),
+            headers={"Location": f"/jobs/{job['id']}"}
+        )
+
+    # Parse straight off the spooled upload instead of reading it into memory
+    if not file.file.read(1):
         raise HTTPException(
             status_code=400,
             detail="File is empty"
         )
+    file.file.seek(0)
 
     try:
-        content = content.decode('utf-8')
-        csv_reader = csv.DictReader(StringIO(content))
-        
-        required_fields = {'name', 'email'}  # Only 'name' and 'email' are strictly required
-        optional_fields = {'subject_ids'}  # Optional fields
-        
+        csv_reader = csv.DictReader(io.TextIOWrapper(file.file, encoding='utf-8', newline=''))
+
         # Validate headers dynamically
         headers = set(csv_reader.fieldnames) if csv_reader.fieldnames else set()
-        missing_required_fields = required_fields - headers
+        missing_required_fields = missing_columns(headers)
         
         if missing_required_fields:
             raise HTTPException(
@@ -193,49 +451,39 @@ async def upload_csv(
             "skipped": []
         }
 
-        for row_number, row in enumerate(csv_reader, start=1):
-            try:
-                if any(not row.get(field) for field in required_fields):
-                    results["skipped"].append({
-                        "row_number": row_number,
-                        "row": row,
-                        "reason": "Missing or empty required fields"
-                    })
-                    continue
-
-                subject_ids = []
-                if 'subject_ids' in headers and row.get('subject_ids'):
-                    try:
-                        subject_ids = [
-                            int(id.strip()) 
-                            for id in row['subject_ids'].replace('"', '').split(',') 
-                            if id.strip()
-                        ]
-                    except ValueError:
-                        raise ValueError("Invalid subject_ids format. Expected comma-separated integers.")
-                    
-                student_data = StudentBase(
-                    name=row['name'],
-                    email=row['email'],
-                    subject_ids=subject_ids
-                )
-                
-                # Attempt to insert the student
-                result = student_ops.insert_student(db, student_data)
+        async def flush(chunk):
+            rows = {row_number: row for row_number, row, _ in chunk}
+            successful, failed = await run_in_session(
+                db, student_ops.bulk_insert_students,
+                [(row_number, student_data) for row_number, _, student_data in chunk]
+            )
+            for row_number, student_data, student_id in successful:
                 results["successful"].append({
                     "row_number": row_number,
-                    "name": row['name'],
-                    "email": row['email'],
-                    "student_id": result["student_id"]
+                    "name": student_data.name,
+                    "email": student_data.email,
+                    "student_id": student_id
                 })
-
-            except Exception as e:
+            for row_number, error in failed:
                 results["failed"].append({
                     "row_number": row_number,
-                    "row": row,
-                    "error": str(e)
+                    "row": rows[row_number],
+                    "error": error
                 })
 
+        row_number = 0
+        for chunk, failed, skipped, row_number in parse_chunks(csv_reader, headers, CSV_IMPORT_CHUNK_SIZE):
+            results["skipped"].extend(
+                {"row_number": number, "row": row, "reason": reason} for number, row, reason in skipped
+            )
+            results["failed"].extend(
+                {"row_number": number, "row": row, "error": error} for number, row, error in failed
+            )
+            if chunk:
+                await flush(chunk)
+
+        results["failed"].sort(key=lambda failure: failure["row_number"])
+
         # Generate response
         if not results["successful"] and results["failed"]:
             return JSONResponse(
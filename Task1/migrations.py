@@ -0,0 +1,86 @@
+"""Bring an existing school database up to the current schema.
+
+``Base.metadata.create_all`` only creates missing tables, so databases created
+before the association tables had primary keys (or the entity tables had a
+version column) keep their old layout. Run this module (or call ``upgrade``)
+to bring them up to date in place.
+"""
+import logging
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import CreateIndex
+from database import engine, Base
+from models import Student, Subject, Teacher, student_subject, teacher_subject
+
+logger = logging.getLogger(__name__)
+
+ASSOCIATION_TABLES = [student_subject, teacher_subject]
+VERSIONED_TABLES = [Student.__table__, Teacher.__table__, Subject.__table__]
+
+# FTS5 index over students and teachers; rowid = id * 2 + kind (0 student, 1 teacher)
+SEARCH_TABLE = "people_search"
+SEARCH_SOURCES = {"students": 0, "teachers": 1}
+
+def rebuild_association_table(conn, table):
+    # Old rows may contain duplicate enrollments, so copy only the distinct pairs
+    old_name = f"{table.name}_old"
+    columns = ", ".join(column.name for column in table.columns)
+    not_null = " AND ".join(f"{column.name} IS NOT NULL" for column in table.columns)
+
+    conn.execute(text(f"ALTER TABLE {table.name} RENAME TO {old_name}"))
+    table.create(conn)
+    conn.execute(text(
+        f"INSERT INTO {table.name} ({columns}) "
+        f"SELECT DISTINCT {columns} FROM {old_name} WHERE {not_null}"
+    ))
+    conn.execute(text(f"DROP TABLE {old_name}"))
+
+def create_search_index(conn):
+    conn.execute(text(
+        f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5("
+        "name, email, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    ))
+    for table, kind in SEARCH_SOURCES.items():
+        row = f"new.id * 2 + {kind}, new.name, new.email"
+        conn.execute(text(
+            f"CREATE TRIGGER {table}_search_insert AFTER INSERT ON {table} BEGIN "
+            f"INSERT INTO {SEARCH_TABLE} (rowid, name, email) VALUES ({row}); END"
+        ))
+        conn.execute(text(
+            f"CREATE TRIGGER {table}_search_update AFTER UPDATE OF name, email ON {table} BEGIN "
+            f"DELETE FROM {SEARCH_TABLE} WHERE rowid = old.id * 2 + {kind}; "
+            f"INSERT INTO {SEARCH_TABLE} (rowid, name, email) VALUES ({row}); END"
+        ))
+        conn.execute(text(
+            f"CREATE TRIGGER {table}_search_delete AFTER DELETE ON {table} BEGIN "
+            f"DELETE FROM {SEARCH_TABLE} WHERE rowid = old.id * 2 + {kind}; END"
+        ))
+        conn.execute(text(
+            f"INSERT INTO {SEARCH_TABLE} (rowid, name, email) SELECT id * 2 + {kind}, name, email FROM {table}"
+        ))
+
+def upgrade(bind=engine):
+    Base.metadata.create_all(bind=bind)
+    with bind.begin() as conn:
+        inspector = inspect(conn)
+        for table in ASSOCIATION_TABLES:
+            if not inspector.get_pk_constraint(table.name)["constrained_columns"]:
+                logger.info(f"Rebuilding {table.name} with a composite primary key")
+                rebuild_association_table(conn, table)
+
+        for table in VERSIONED_TABLES:
+            if "version" not in {column["name"] for column in inspector.get_columns(table.name)}:
+                logger.info(f"Adding version column to {table.name}")
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN version INTEGER NOT NULL DEFAULT 1"))
+
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                conn.execute(CreateIndex(index, if_not_exists=True))
+
+        # Other engines search through the lower(name)/lower(email) prefix indexes instead
+        if conn.dialect.name == "sqlite" and not inspector.has_table(SEARCH_TABLE):
+            logger.info(f"Building full-text search index {SEARCH_TABLE}")
+            create_search_index(conn)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    upgrade()
@@ -1,32 +1,44 @@
-from sqlalchemy import Column, Integer, String, Table, ForeignKey
+from sqlalchemy import Column, Integer, String, Table, ForeignKey, Index, func
 from sqlalchemy.orm import relationship
 from database import Base
 
 student_subject = Table(
     'student_subject',
     Base.metadata,
-    Column('student_id', Integer, ForeignKey('students.id')),
-    Column('subject_id', Integer, ForeignKey('subjects.id'))
+    Column('student_id', Integer, ForeignKey('students.id'), primary_key=True),
+    Column('subject_id', Integer, ForeignKey('subjects.id'), primary_key=True),
+    # The primary key serves student -> subjects; this serves subject -> students
+    Index('ix_student_subject_subject_id', 'subject_id', 'student_id')
 )
 
 teacher_subject = Table(
     'teacher_subject',
     Base.metadata,
-    Column('teacher_id', Integer, ForeignKey('teachers.id')),
-    Column('subject_id', Integer, ForeignKey('subjects.id'))
+    Column('teacher_id', Integer, ForeignKey('teachers.id'), primary_key=True),
+    Column('subject_id', Integer, ForeignKey('subjects.id'), primary_key=True),
+    # The primary key serves teacher -> subjects; this serves subject -> teachers
+    Index('ix_teacher_subject_subject_id', 'subject_id', 'teacher_id')
 )
 
 class Student(Base):
     __tablename__ = "students"
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String)
-    email = Column(String, unique=True)
+    email = Column(String, unique=True, index=True)
+    # Bumped by every write that changes the entity's view; drives its ETag
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     subjects = relationship("Subject", secondary=student_subject, back_populates="students")
+    # Prefix search on engines without FTS5
+    __table_args__ = (
+        Index("ix_students_name_lower", func.lower(name)),
+        Index("ix_students_email_lower", func.lower(email)),
+    )
 
 class Subject(Base):
     __tablename__ = "subjects"
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     students = relationship("Student", secondary=student_subject, back_populates="subjects")
     teachers = relationship("Teacher", secondary=teacher_subject, back_populates="subjects")
 
@@ -34,5 +46,12 @@ class Teacher(Base):
     __tablename__ = "teachers"
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String)
-    email = Column(String, unique=True)
-    subjects = relationship("Subject", secondary=teacher_subject, back_populates="teachers")
\ No newline at end of file
+    email = Column(String, unique=True, index=True)
+    # Bumped by every write that changes the entity's view; drives its ETag
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    subjects = relationship("Subject", secondary=teacher_subject, back_populates="teachers")
+    # Prefix search on engines without FTS5
+    __table_args__ = (
+        Index("ix_teachers_name_lower", func.lower(name)),
+        Index("ix_teachers_email_lower", func.lower(email)),
+    )
\ No newline at end of file
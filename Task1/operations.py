@@ -1,66 +1,484 @@
 from fastapi import HTTPException
-from typing import List, Optional
-from sqlalchemy.orm import Session
+from typing import List, Optional, Tuple
+from sqlalchemy.orm import Session, selectinload
 from sqlalchemy.exc import IntegrityError
-from models import Student, Subject, Teacher
-from schemas import StudentBase, TeacherBase, SubjectBase
+from models import Student, Subject, Teacher, student_subject, teacher_subject
+from cache import entity_cache
+from schemas import (
+    StudentBase, TeacherBase, SubjectBase, SubjectRef, PersonRef, StudentOut, TeacherOut,
+    SubjectSummary, Page, Batch, RosterPage, SearchHit, SearchPage,
+    SubjectEnrollmentStats, SubjectHistogram, HistogramBucket
+)
+import base64
 import csv
 import io
-from sqlalchemy import desc
+import json
+import re
+import time
+from sqlalchemy import and_, delete, desc, func, insert, inspect, literal, or_, select, text, true, union_all, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
 
 class BaseOperations:
-    def paginate_query(self, query, page: int = 1, page_size: int = 10):
-        # Validate pagination parameters
-        if page < 1:
-            raise HTTPException(status_code=400, detail="Page number must be greater than 0")
+    cache = entity_cache
+    MAX_BULK_IDS = 10000
+    # selectinload fetches relationships 500 parents at a time, so batches up to
+    # this size load every relationship with a single IN query
+    MAX_BATCH_IDS = 500
+    EXPORT_BATCH_SIZE = 1000
+
+    # Row counts are cached briefly so list pages don't pay a full COUNT(*) each time
+    COUNT_CACHE_TTL = 5.0
+    _count_cache = {}
+
+    # Whole-table aggregates are recomputed at most this often
+    STATS_CACHE_TTL = 30.0
+    _stats_cache = {}
+
+    def validate_page_size(self, page_size: int):
         if page_size < 1:
             raise HTTPException(status_code=400, detail="Page size must be greater than 0")
         if page_size > 100:  # Add maximum page size limit
             raise HTTPException(status_code=400, detail="Page size cannot exceed 100")
+
+    def paginate_query(self, query, page: int = 1, page_size: int = 10):
+        # Validate pagination parameters
+        if page < 1:
+            raise HTTPException(status_code=400, detail="Page number must be greater than 0")
+        self.validate_page_size(page_size)
             
         return query.offset((page - 1) * page_size).limit(page_size)
 
-class StudentOperations(BaseOperations):
-    def get_students(self, db: Session, page: int = 1, page_size: int = 10):
-        query = db.query(Student)
-        total = query.count()
-        students = self.paginate_query(query, page, page_size).all()
-        
+    def paginate_keyset(self, query, model, cursor: Optional[str], page_size: int = 10):
+        # Seek past the last id of the previous page instead of skipping rows with OFFSET
+        self.validate_page_size(page_size)
+        if cursor:
+            query = query.filter(model.id > self.decode_cursor(cursor))
+        return query.order_by(model.id).limit(page_size)
+
+    def encode_cursor(self, last_id: int) -> str:
+        return base64.urlsafe_b64encode(json.dumps({"id": last_id}).encode()).decode()
+
+    def decode_cursor(self, cursor: str) -> int:
+        try:
+            return int(json.loads(base64.urlsafe_b64decode(cursor.encode()))["id"])
+        except (ValueError, KeyError, TypeError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    def count_rows(self, db: Session, model) -> int:
+        key = model.__tablename__
+        cached = self._count_cache.get(key)
+        now = time.monotonic()
+        if cached and now - cached[1] < self.COUNT_CACHE_TTL:
+            return cached[0]
+        total = db.query(func.count(model.id)).scalar()
+        self._count_cache[key] = (total, now)
+        return total
+
+    def invalidate_count(self, model):
+        self._count_cache.pop(model.__tablename__, None)
+
+    def cached_stats(self, key, compute):
+        cached = self._stats_cache.get(key)
+        now = time.monotonic()
+        if cached and now - cached[1] < self.STATS_CACHE_TTL:
+            return cached[0]
+        stats = compute()
+        self._stats_cache[key] = (stats, now)
+        return stats
+
+    def subject_histogram(self, db: Session, person_model, person_column) -> SubjectHistogram:
+        """How many people take 0, 1, 2, ... subjects, from one GROUP BY over the links."""
+        per_person = (
+            select(person_column, func.count().label("subjects"))
+            .group_by(person_column)
+            .subquery()
+        )
+        buckets = dict(db.execute(
+            select(per_person.c.subjects, func.count())
+            .group_by(per_person.c.subjects)
+        ).all())
+        people = db.query(func.count(person_model.id)).scalar()
+        # People without any link never appear in the association table
+        unlinked = people - sum(buckets.values())
+        if unlinked > 0:
+            buckets[0] = unlinked
+
+        links = sum(subjects * count for subjects, count in buckets.items())
+        return SubjectHistogram(
+            total=people,
+            mean=round(links / people, 2) if people else 0.0,
+            buckets=[HistogramBucket(subjects=subjects, count=buckets[subjects]) for subjects in sorted(buckets)]
+        )
+
+    def cached_view(self, kind: str, entity_id: int, load):
+        view = self.cache.get(kind, entity_id)
+        if view is None:
+            view = load()
+            self.cache.set(kind, entity_id, view)
+        return view
+
+    VERSIONED = {"student": Student, "teacher": Teacher, "subject": Subject}
+
+    def get_version(self, db: Session, kind: str, entity_id: int) -> int:
+        model = self.VERSIONED[kind]
+        version = db.query(model.version).filter(model.id == entity_id).scalar()
+        if version is None:
+            raise HTTPException(status_code=404, detail=f"{kind.capitalize()} not found")
+        return version
+
+    def bump_versions(self, db: Session, model, ids):
+        """Advance the version (and so the ETag) of ``ids``; call before committing.
+
+        ``ids`` is a collection or a SELECT of ids, the latter for sets too big
+        to bind as parameters.
+        """
+        if not isinstance(ids, Select):
+            ids = list(ids)
+            if not ids:
+                return
+        db.execute(
+            update(model).where(model.id.in_(ids)).values(version=model.version + 1),
+            execution_options={"synchronize_session": False}
+        )
+
+    def parse_ids(self, ids: str) -> List[int]:
+        try:
+            return [int(entity_id) for entity_id in ids.split(",") if entity_id.strip()]
+        except ValueError:
+            raise HTTPException(status_code=400, detail="ids must be comma-separated integers")
+
+    def get_batch(self, db: Session, kind: str, ids: List[int], load_many):
+        """Return the cached views for ``ids``, loading every miss with one ``load_many`` call.
+
+        Items come back in request order (duplicates dropped); ids that do not
+        exist are listed in ``missing``.
+        """
+        ids = list(dict.fromkeys(ids))
+        if len(ids) > self.MAX_BATCH_IDS:
+            raise HTTPException(status_code=400, detail=f"Cannot fetch more than {self.MAX_BATCH_IDS} ids at once")
+
+        views = {}
+        for entity_id in ids:
+            view = self.cache.get(kind, entity_id)
+            if view is not None:
+                views[entity_id] = view
+        misses = [entity_id for entity_id in ids if entity_id not in views]
+        if misses:
+            for view in load_many(db, misses):
+                self.cache.set(kind, view.id, view)
+                views[view.id] = view
+
+        return Batch(
+            items=[views[entity_id] for entity_id in ids if entity_id in views],
+            missing=[entity_id for entity_id in ids if entity_id not in views]
+        )
+
+    def replace_subject_links(self, db: Session, person_column, person_id: int, subject_ids: List[int]):
+        """Make the person's subject links match ``subject_ids`` (unknown ids are ignored).
+
+        Only the difference is written: one DELETE for dropped links and one
+        multi-row INSERT for new ones. Returns the ids of the subjects whose
+        links changed.
+        """
+        association = person_column.table
+        current = {
+            subject_id for (subject_id,) in
+            db.query(association.c.subject_id).filter(person_column == person_id)
+        }
+        wanted = {
+            subject_id for (subject_id,) in
+            db.query(Subject.id).filter(Subject.id.in_(subject_ids))
+        } if subject_ids else set()
+
+        removed, added = current - wanted, wanted - current
+        if removed:
+            db.execute(
+                delete(association)
+                .where(person_column == person_id)
+                .where(association.c.subject_id.in_(removed))
+            )
+        if added:
+            db.execute(
+                association.insert(),
+                [{person_column.name: person_id, "subject_id": subject_id} for subject_id in added]
+            )
+        return removed | added
+
+    def bulk_link_subjects(self, db: Session, kind: str, person_model, person_column,
+                           person_ids: List[int], subject_ids: List[int]):
+        """Link every person in ``person_ids`` to every subject in ``subject_ids``.
+
+        Runs as one INSERT ... SELECT over the cross product of the existing
+        people and subjects, skipping pairs that are already linked.
+        """
+        if len(person_ids) > self.MAX_BULK_IDS or len(subject_ids) > self.MAX_BULK_IDS:
+            raise HTTPException(status_code=400, detail=f"Cannot link more than {self.MAX_BULK_IDS} ids at once")
+
+        association = person_column.table
+        found_person_ids = {
+            person_id for (person_id,) in db.query(person_model.id).filter(person_model.id.in_(person_ids))
+        }
+        found_subject_ids = {
+            subject_id for (subject_id,) in db.query(Subject.id).filter(Subject.id.in_(subject_ids))
+        }
+
+        already_linked = (
+            select(association.c.subject_id)
+            .where(person_column == person_model.id)
+            .where(association.c.subject_id == Subject.id)
+            .exists()
+        )
+        pairs = (
+            select(person_model.id, Subject.id)
+            .join(Subject, true())
+            .where(person_model.id.in_(found_person_ids))
+            .where(Subject.id.in_(found_subject_ids))
+            .where(~already_linked)
+        )
+        result = db.execute(insert(association).from_select([person_column.name, "subject_id"], pairs))
+        if result.rowcount:
+            self.bump_versions(db, person_model, found_person_ids)
+            self.bump_versions(db, Subject, found_subject_ids)
+        db.commit()
+
+        self.cache.invalidate(kind, found_person_ids)
+        self.cache.invalidate("subject", found_subject_ids)
         return {
-            "items": [self.get_student_data(db, student.id) for student in students],
-            "total": total,
-            "page": page,
-            "page_size": page_size,
-            "pages": (total + page_size - 1) // page_size
+            "linked": result.rowcount,
+            f"missing_{kind}_ids": sorted(set(person_ids) - found_person_ids),
+            "missing_subject_ids": sorted(set(subject_ids) - found_subject_ids)
+        }
+
+    def insert_people_batch(self, db: Session, kind: str, person_model, person_column, people: list, insert_one):
+        """Create several people and their subject links in one transaction.
+
+        Returns one outcome per person, in order: the same dict ``insert_one``
+        returns, or the HTTPException that person would have raised. Emails
+        that already exist (or repeat within the batch) fail on their own; if
+        a concurrent writer still trips the unique index, every person is
+        retried through ``insert_one`` on its own.
+        """
+        emails = {person.email for person in people}
+        subject_ids = {subject_id for person in people for subject_id in person.subject_ids}
+        existing_emails = {
+            email for (email,) in db.query(person_model.email).filter(person_model.email.in_(emails))
         }
+        subjects = {
+            subject.id: SubjectRef.model_validate(subject)
+            for subject in db.query(Subject).filter(Subject.id.in_(subject_ids)).order_by(Subject.id)
+        } if subject_ids else {}
+
+        outcomes = [None] * len(people)
+        pending = []
+        for index, person in enumerate(people):
+            if person.email in existing_emails:
+                outcomes[index] = HTTPException(status_code=400, detail="Email already exists in the database")
+                continue
+            existing_emails.add(person.email)
+            pending.append(index)
+
+        if not pending:
+            return outcomes
+
+        try:
+            # Ordered RETURNING falls back to one INSERT per row on SQLite, so insert
+            # in bulk and map the new ids back through the unique emails instead
+            db.execute(
+                insert(person_model),
+                [{"name": people[index].name, "email": people[index].email} for index in pending]
+            )
+            ids_by_email = dict(
+                db.query(person_model.email, person_model.id)
+                .filter(person_model.email.in_([people[index].email for index in pending]))
+            )
+            links = [
+                {person_column.name: ids_by_email[people[index].email], "subject_id": subject_id}
+                for index in pending
+                for subject_id in sorted(set(people[index].subject_ids))
+                if subject_id in subjects
+            ]
+            if links:
+                db.execute(person_column.table.insert(), links)
+                self.bump_versions(db, Subject, {link["subject_id"] for link in links})
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            for index in pending:
+                try:
+                    outcomes[index] = insert_one(db, people[index])
+                except HTTPException as e:
+                    outcomes[index] = e
+                except IntegrityError:
+                    db.rollback()
+                    outcomes[index] = HTTPException(status_code=400, detail="Email already exists in the database")
+            return outcomes
+
+        self.invalidate_count(person_model)
+        self.cache.invalidate("subject", {link["subject_id"] for link in links})
+        for index in pending:
+            person = people[index]
+            requested = set(person.subject_ids)
+            outcomes[index] = {
+                f"{kind}_id": ids_by_email[person.email],
+                "successfully_linked_subjects": [
+                    subject for subject_id, subject in subjects.items() if subject_id in requested
+                ],
+                "failed_subjects": list(requested - subjects.keys())
+            }
+        return outcomes
+
+    def export_statement(self, person_model, person_column):
+        # One row per (person, subject) pair, ordered so each person's rows are adjacent
+        association = person_column.table
+        return (
+            select(person_model.id, person_model.name, person_model.email, association.c.subject_id)
+            .outerjoin(association, person_column == person_model.id)
+            .order_by(person_model.id, association.c.subject_id)
+            .execution_options(yield_per=self.EXPORT_BATCH_SIZE)
+        )
+
+    def render_export_rows(self, rows, export_format: str, state: dict) -> str:
+        """Render a batch of export rows, folding subject ids into their person.
+
+        The last person of a batch may continue in the next one, so it is held
+        in ``state`` and written once a different id (or the end) is reached.
+        """
+        out = io.StringIO()
+        for person_id, name, email, subject_id in rows:
+            current = state.get("current")
+            if current and current["id"] == person_id:
+                current["subject_ids"].append(subject_id)
+                continue
+            if current:
+                self.write_export_row(out, export_format, current)
+            state["current"] = {
+                "id": person_id,
+                "name": name,
+                "email": email,
+                "subject_ids": [subject_id] if subject_id is not None else []
+            }
+        return out.getvalue()
+
+    def finish_export(self, export_format: str, state: dict) -> str:
+        out = io.StringIO()
+        if state.get("current"):
+            self.write_export_row(out, export_format, state["current"])
+        return out.getvalue()
+
+    def write_export_row(self, out, export_format: str, person: dict):
+        if export_format == "csv":
+            csv.writer(out).writerow([
+                person["id"], person["name"], person["email"],
+                ",".join(str(subject_id) for subject_id in person["subject_ids"])
+            ])
+        else:
+            out.write(json.dumps(person) + "\n")
+
+    def stream_export(self, db: Session, export_format: str):
+        statement = self.export_statement(*self.EXPORT_SOURCE)
+        state = {}
+        if export_format == "csv":
+            yield "id,name,email,subject_ids\r\n"
+        for rows in db.execute(statement).partitions():
+            yield self.render_export_rows(rows, export_format, state)
+        yield self.finish_export(export_format, state)
+
+    async def stream_export_async(self, db: AsyncSession, export_format: str):
+        statement = self.export_statement(*self.EXPORT_SOURCE)
+        state = {}
+        if export_format == "csv":
+            yield "id,name,email,subject_ids\r\n"
+        result = await db.stream(statement)
+        async for rows in result.partitions():
+            yield self.render_export_rows(rows, export_format, state)
+        yield self.finish_export(export_format, state)
+
+    def list_page(self, db: Session, query, model, serialize, page: int = 1, page_size: int = 10,
+                  cursor: Optional[str] = None, include_total: bool = True):
+        if cursor is not None:
+            rows = self.paginate_keyset(query, model, cursor, page_size).all()
+        else:
+            rows = self.paginate_query(query.order_by(model.id), page, page_size).all()
+
+        total = self.count_rows(db, model) if include_total else None
+        next_cursor = self.encode_cursor(rows[-1].id) if len(rows) == page_size else None
+
+        page_info = {}
+        if cursor is None:
+            page_info["page"] = page
+            page_info["pages"] = (total + page_size - 1) // page_size if total is not None else None
+        return Page(
+            items=[serialize(row) for row in rows],
+            total=total,
+            page_size=page_size,
+            next_cursor=next_cursor,
+            **page_info
+        )
+
+class StudentOperations(BaseOperations):
+    EXPORT_SOURCE = (Student, student_subject.c.student_id)
+
+    def get_students(self, db: Session, page: int = 1, page_size: int = 10,
+                     cursor: Optional[str] = None, include_total: bool = True):
+        # Subjects for the whole page are loaded with a single IN query
+        query = db.query(Student).options(selectinload(Student.subjects))
+        return self.list_page(db, query, Student, self.serialize_student, page, page_size, cursor, include_total)
 
     def get_student_data(self, db: Session, student_id: int):
-        student = db.query(Student).filter(Student.id == student_id).first()
+        return self.cached_view("student", student_id, lambda: self.load_student_data(db, student_id))
+
+    def load_student_data(self, db: Session, student_id: int):
+        student = (
+            db.query(Student)
+            .options(selectinload(Student.subjects))
+            .filter(Student.id == student_id)
+            .first()
+        )
         if not student:
             raise HTTPException(status_code=404, detail="Student not found")
         
-        return {
-            "id": student.id,
-            "name": student.name,
-            "email": student.email,
-            "subjects": [{"id": subject.id, "name": subject.name} for subject in student.subjects]
-        }
+        return self.serialize_student(student)
+
+    def get_students_batch(self, db: Session, student_ids: List[int]):
+        return self.get_batch(db, "student", student_ids, self.load_students)
+
+    def load_students(self, db: Session, student_ids: List[int]):
+        students = (
+            db.query(Student)
+            .options(selectinload(Student.subjects))
+            .filter(Student.id.in_(student_ids))
+        )
+        return [self.serialize_student(student) for student in students]
+
+    def get_subject_histogram(self, db: Session):
+        return self.cached_stats(
+            "student_subjects",
+            lambda: self.subject_histogram(db, Student, student_subject.c.student_id)
+        )
+
+    def serialize_student(self, student: Student):
+        return StudentOut.model_validate(student)
 
     def insert_student(self, db: Session, student_data: StudentBase):
         try:
             student = Student(name=student_data.name, email=student_data.email)
             db.add(student)
             db.commit()
+            self.invalidate_count(Student)
             
             response = {"student_id": student.id, "successfully_linked_subjects": [], "failed_subjects": []}
             
             if student_data.subject_ids:
                 subjects = db.query(Subject).filter(Subject.id.in_(student_data.subject_ids)).all()
                 student.subjects.extend(subjects)
+                self.bump_versions(db, Student, [student.id])
+                self.bump_versions(db, Subject, [subject.id for subject in subjects])
                 db.commit()
                 db.refresh(student)
+                self.cache.invalidate("subject", [subject.id for subject in subjects])
                 
-                response["successfully_linked_subjects"] = [{"id": subject.id, "name": subject.name} for subject in subjects]
+                response["successfully_linked_subjects"] = [SubjectRef.model_validate(subject) for subject in subjects]
                 response["failed_subjects"] = list(set(student_data.subject_ids) - {subject.id for subject in subjects})
                 
             return response
@@ -71,6 +489,27 @@ class StudentOperations(BaseOperations):
                 detail="Email already exists in the database"
             )
 
+    def insert_students_batch(self, db: Session, students: List[StudentBase]):
+        return self.insert_people_batch(
+            db, "student", Student, student_subject.c.student_id, students, self.insert_student
+        )
+
+    def bulk_insert_students(self, db: Session, rows: List[Tuple[int, StudentBase]]):
+        """Insert a chunk of (row_number, student) pairs in one transaction.
+
+        A thin wrapper over ``insert_people_batch`` for the CSV importers: returns
+        ``successful`` as (row_number, student, student_id) and ``failed`` as
+        (row_number, error) tuples.
+        """
+        successful, failed = [], []
+        outcomes = self.insert_students_batch(db, [student for _, student in rows])
+        for (row_number, student), outcome in zip(rows, outcomes):
+            if isinstance(outcome, HTTPException):
+                failed.append((row_number, outcome.detail))
+            else:
+                successful.append((row_number, student, outcome["student_id"]))
+        return successful, failed
+
     def update_student(self, db: Session, student_id: int, student_data: dict):
         student = db.query(Student).filter(Student.id == student_id).first()
         if not student:
@@ -80,14 +519,23 @@ class StudentOperations(BaseOperations):
             student.name = student_data["name"]
         if "email" in student_data:
             student.email = student_data["email"]
+        changed_subject_ids = set()
         if "subject_ids" in student_data:
-            student.subjects = []
-            subjects = db.query(Subject).filter(Subject.id.in_(student_data["subject_ids"])).all()
-            student.subjects.extend(subjects)
+            changed_subject_ids = self.replace_subject_links(
+                db, student_subject.c.student_id, student_id, student_data["subject_ids"]
+            )
+        self.bump_versions(db, Student, [student_id])
+        self.bump_versions(db, Subject, changed_subject_ids)
         
         db.commit()
+        # Subject views only carry roster counts, so just the subjects gained or lost go stale
+        self.cache.invalidate("student", [student_id])
+        self.cache.invalidate("subject", changed_subject_ids)
         return self.get_student_data(db, student_id)
     
+    def enroll_students(self, db: Session, student_ids: List[int], subject_ids: List[int]):
+        return self.bulk_link_subjects(db, "student", Student, student_subject.c.student_id, student_ids, subject_ids)
+
     def remove_subject_student(self, db: Session, student_id: int, subject_id: int):
         student = db.query(Student).filter(Student.id == student_id).first()
         if not student:
@@ -101,53 +549,83 @@ class StudentOperations(BaseOperations):
             raise HTTPException(status_code=404, detail="Subject not assigned to this student")
             
         student.subjects.remove(subject)
+        self.bump_versions(db, Student, [student_id])
+        self.bump_versions(db, Subject, [subject_id])
         db.commit()
+        self.cache.invalidate("student", [student_id])
+        self.cache.invalidate("subject", [subject_id])
         return self.get_student_data(db, student_id)
 
 class TeacherOperations(BaseOperations):
-    def get_teachers(self, db: Session, page: int = 1, page_size: int = 10):
-        query = db.query(Teacher)
-        total = query.count()
-        teachers = self.paginate_query(query, page, page_size).all()
-        
-        return {
-            "items": [self.get_teacher_data(db, teacher.id) for teacher in teachers],
-            "total": total,
-            "page": page,
-            "page_size": page_size,
-            "pages": (total + page_size - 1) // page_size
-        }
+    EXPORT_SOURCE = (Teacher, teacher_subject.c.teacher_id)
+
+    def get_teachers(self, db: Session, page: int = 1, page_size: int = 10,
+                     cursor: Optional[str] = None, include_total: bool = True):
+        query = db.query(Teacher).options(selectinload(Teacher.subjects))
+        return self.list_page(db, query, Teacher, self.serialize_teacher, page, page_size, cursor, include_total)
 
     def get_teacher_data(self, db: Session, teacher_id: int):
-        teacher = db.query(Teacher).filter(Teacher.id == teacher_id).first()
+        return self.cached_view("teacher", teacher_id, lambda: self.load_teacher_data(db, teacher_id))
+
+    def load_teacher_data(self, db: Session, teacher_id: int):
+        teacher = (
+            db.query(Teacher)
+            .options(selectinload(Teacher.subjects))
+            .filter(Teacher.id == teacher_id)
+            .first()
+        )
         if not teacher:
             raise HTTPException(status_code=404, detail="Teacher not found")
         
-        return {
-            "id": teacher.id,
-            "name": teacher.name,
-            "email": teacher.email,
-            "subjects": [{"id": subject.id, "name": subject.name} for subject in teacher.subjects]
-        }
+        return self.serialize_teacher(teacher)
+
+    def get_teachers_batch(self, db: Session, teacher_ids: List[int]):
+        return self.get_batch(db, "teacher", teacher_ids, self.load_teachers)
+
+    def load_teachers(self, db: Session, teacher_ids: List[int]):
+        teachers = (
+            db.query(Teacher)
+            .options(selectinload(Teacher.subjects))
+            .filter(Teacher.id.in_(teacher_ids))
+        )
+        return [self.serialize_teacher(teacher) for teacher in teachers]
+
+    def get_subject_histogram(self, db: Session):
+        return self.cached_stats(
+            "teacher_subjects",
+            lambda: self.subject_histogram(db, Teacher, teacher_subject.c.teacher_id)
+        )
+
+    def serialize_teacher(self, teacher: Teacher):
+        return TeacherOut.model_validate(teacher)
 
     def insert_teacher(self, db: Session, teacher_data: TeacherBase):
         teacher = Teacher(name=teacher_data.name, email=teacher_data.email)
         db.add(teacher)
         db.commit()
+        self.invalidate_count(Teacher)
 
         response = {"teacher_id": teacher.id, "successfully_linked_subjects": [], "failed_subjects": []}
 
         if teacher_data.subject_ids:
             subjects = db.query(Subject).filter(Subject.id.in_(teacher_data.subject_ids)).all()
             teacher.subjects.extend(subjects)
+            self.bump_versions(db, Teacher, [teacher.id])
+            self.bump_versions(db, Subject, [subject.id for subject in subjects])
             db.commit()
             db.refresh(teacher)
+            self.cache.invalidate("subject", [subject.id for subject in subjects])
 
-            response["successfully_linked_subjects"] = [{"id": subject.id, "name": subject.name} for subject in subjects]
+            response["successfully_linked_subjects"] = [SubjectRef.model_validate(subject) for subject in subjects]
             response["failed_subjects"] = list(set(teacher_data.subject_ids) - {subject.id for subject in subjects})
 
         return response
 
+    def insert_teachers_batch(self, db: Session, teachers: List[TeacherBase]):
+        return self.insert_people_batch(
+            db, "teacher", Teacher, teacher_subject.c.teacher_id, teachers, self.insert_teacher
+        )
+
     def update_teacher(self, db: Session, teacher_id: int, teacher_data: dict):
         teacher = db.query(Teacher).filter(Teacher.id == teacher_id).first()
         if not teacher:
@@ -157,14 +635,23 @@ class TeacherOperations(BaseOperations):
             teacher.name = teacher_data["name"]
         if "email" in teacher_data:
             teacher.email = teacher_data["email"]
+        changed_subject_ids = set()
         if "subject_ids" in teacher_data:
-            teacher.subjects = []
-            subjects = db.query(Subject).filter(Subject.id.in_(teacher_data["subject_ids"])).all()
-            teacher.subjects.extend(subjects)
+            changed_subject_ids = self.replace_subject_links(
+                db, teacher_subject.c.teacher_id, teacher_id, teacher_data["subject_ids"]
+            )
+        self.bump_versions(db, Teacher, [teacher_id])
+        self.bump_versions(db, Subject, changed_subject_ids)
         
         db.commit()
+        # Subject views only carry roster counts, so just the subjects gained or lost go stale
+        self.cache.invalidate("teacher", [teacher_id])
+        self.cache.invalidate("subject", changed_subject_ids)
         return self.get_teacher_data(db, teacher_id)
     
+    def assign_teachers(self, db: Session, teacher_ids: List[int], subject_ids: List[int]):
+        return self.bulk_link_subjects(db, "teacher", Teacher, teacher_subject.c.teacher_id, teacher_ids, subject_ids)
+
     def remove_subject_teacher(self, db: Session, teacher_id: int, subject_id: int):
         teacher = db.query(Teacher).filter(Teacher.id == teacher_id).first()
         if not teacher:
@@ -178,41 +665,185 @@ class TeacherOperations(BaseOperations):
             raise HTTPException(status_code=404, detail="Subject not assigned to this teacher")
             
         teacher.subjects.remove(subject)
+        self.bump_versions(db, Teacher, [teacher_id])
+        self.bump_versions(db, Subject, [subject_id])
         db.commit()
+        self.cache.invalidate("teacher", [teacher_id])
+        self.cache.invalidate("subject", [subject_id])
         return self.get_teacher_data(db, teacher_id)
 
 class SubjectOperations(BaseOperations):
-    def get_subjects(self, db: Session, page: int = 1, page_size: int = 10):
-        query = db.query(Subject)
-        total = query.count()
-        subjects = self.paginate_query(query, page, page_size).all()
-        
-        return {
-            "items": [self.get_subject_data(db, subject.id) for subject in subjects],
-            "total": total,
-            "page": page,
-            "page_size": page_size,
-            "pages": (total + page_size - 1) // page_size
-        }
+    ROSTERS = {
+        "students": (Student, student_subject.c.student_id),
+        "teachers": (Teacher, teacher_subject.c.teacher_id),
+    }
+    ROSTER_STREAM_BATCH = 1000
+
+    def get_subjects(self, db: Session, page: int = 1, page_size: int = 10,
+                     cursor: Optional[str] = None, include_total: bool = True):
+        # Like the detail view, list items carry roster sizes rather than the rosters,
+        # counted for the whole page with one GROUP BY per roster
+        subjects = self.list_page(db, db.query(Subject), Subject, lambda subject: subject,
+                                  page, page_size, cursor, include_total)
+        return subjects.model_copy(update={"items": self.summarize_subjects(db, subjects.items)})
 
     def get_subject_data(self, db: Session, subject_id: int):
+        return self.cached_view("subject", subject_id, lambda: self.load_subject_data(db, subject_id))
+
+    def load_subject_data(self, db: Session, subject_id: int):
+        # Rosters can be huge, so the detail view only carries their sizes;
+        # the people themselves are paged through get_subject_roster
         subject = db.query(Subject).filter(Subject.id == subject_id).first()
         if not subject:
             raise HTTPException(status_code=404, detail="Subject not found")
 
-        return {
-            "id": subject.id,
-            "name": subject.name,
-            "students": [{"id": student.id, "name": student.name, "email": student.email} 
-                        for student in subject.students],
-            "teachers": [{"id": teacher.id, "name": teacher.name, "email": teacher.email} 
-                        for teacher in subject.teachers]
-        }
+        return SubjectSummary(
+            id=subject.id,
+            name=subject.name,
+            version=subject.version,
+            student_count=self.count_roster(db, subject_id, "students"),
+            teacher_count=self.count_roster(db, subject_id, "teachers")
+        )
+
+    def get_subjects_batch(self, db: Session, subject_ids: List[int]):
+        return self.get_batch(db, "subject", subject_ids, self.load_subjects)
+
+    def load_subjects(self, db: Session, subject_ids: List[int]):
+        subjects = db.query(Subject).filter(Subject.id.in_(subject_ids)).all()
+        return self.summarize_subjects(db, subjects)
+
+    def summarize_subjects(self, db: Session, subjects: List[Subject]) -> List[SubjectSummary]:
+        if not subjects:
+            return []
+
+        counts = self.roster_counts(db, [subject.id for subject in subjects])
+        return [
+            SubjectSummary(
+                id=subject.id,
+                name=subject.name,
+                version=subject.version,
+                student_count=counts["students"].get(subject.id, 0),
+                teacher_count=counts["teachers"].get(subject.id, 0)
+            )
+            for subject in subjects
+        ]
+
+    def roster_counts(self, db: Session, subject_ids: List[int]) -> dict:
+        """Roster sizes for ``subject_ids`` with one GROUP BY per roster.
+
+        The (subject_id, person_id) indexes cover these queries, so only the
+        index entries of the requested subjects are read.
+        """
+        counts = {}
+        for roster, (_, person_id) in self.ROSTERS.items():
+            association = person_id.table
+            counts[roster] = dict(
+                db.query(association.c.subject_id, func.count())
+                .filter(association.c.subject_id.in_(subject_ids))
+                .group_by(association.c.subject_id)
+            )
+        return counts
+
+    def enrollment_stats(self, subject_id: int, name: str, counts: dict) -> SubjectEnrollmentStats:
+        student_count = counts["students"].get(subject_id, 0)
+        teacher_count = counts["teachers"].get(subject_id, 0)
+        return SubjectEnrollmentStats(
+            id=subject_id,
+            name=name,
+            student_count=student_count,
+            teacher_count=teacher_count,
+            students_per_teacher=round(student_count / teacher_count, 2) if teacher_count else None
+        )
+
+    def get_enrollment_stats(self, db: Session, page: int = 1, page_size: int = 10):
+        subjects = self.paginate_query(db.query(Subject.id, Subject.name).order_by(Subject.id), page, page_size).all()
+        counts = self.roster_counts(db, [subject_id for subject_id, _ in subjects])
+        total = self.count_rows(db, Subject)
+        return Page(
+            items=[self.enrollment_stats(subject_id, name, counts) for subject_id, name in subjects],
+            total=total,
+            page=page,
+            page_size=page_size,
+            pages=(total + page_size - 1) // page_size
+        )
+
+    def get_top_subjects(self, db: Session, limit: int = 10, roster: str = "students"):
+        return self.cached_stats(("top_subjects", limit, roster), lambda: self.load_top_subjects(db, limit, roster))
+
+    def load_top_subjects(self, db: Session, limit: int, roster: str):
+        association = self.ROSTERS[roster][1].table
+        top = (
+            db.query(association.c.subject_id, func.count().label("enrolled"))
+            .group_by(association.c.subject_id)
+            .order_by(desc("enrolled"), association.c.subject_id)
+            .limit(limit)
+            .all()
+        )
+        subject_ids = [subject_id for subject_id, _ in top]
+        names = dict(db.query(Subject.id, Subject.name).filter(Subject.id.in_(subject_ids)))
+        counts = self.roster_counts(db, subject_ids)
+        return [
+            self.enrollment_stats(subject_id, names[subject_id], counts)
+            for subject_id in subject_ids if subject_id in names
+        ]
+
+    def roster_statement(self, subject_id: int, roster: str, after_id: Optional[int] = None):
+        model, person_id = self.ROSTERS[roster]
+        association = person_id.table
+        # Filtering and ordering on the association columns walks ix_*_subject_subject_id
+        stmt = (
+            select(model.id, model.name, model.email)
+            .join(association, person_id == model.id)
+            .where(association.c.subject_id == subject_id)
+            .order_by(person_id)
+        )
+        if after_id is not None:
+            stmt = stmt.where(person_id > after_id)
+        return stmt
+
+    def count_roster(self, db: Session, subject_id: int, roster: str) -> int:
+        association = self.ROSTERS[roster][1].table
+        return db.execute(
+            select(func.count()).select_from(association).where(association.c.subject_id == subject_id)
+        ).scalar()
+
+    def ensure_subject_exists(self, db: Session, subject_id: int):
+        if db.query(Subject.id).filter(Subject.id == subject_id).first() is None:
+            raise HTTPException(status_code=404, detail="Subject not found")
+
+    def get_subject_roster(self, db: Session, subject_id: int, roster: str,
+                           cursor: Optional[str] = None, page_size: int = 10):
+        self.ensure_subject_exists(db, subject_id)
+        self.validate_page_size(page_size)
+        after_id = self.decode_cursor(cursor) if cursor else None
+        rows = db.execute(self.roster_statement(subject_id, roster, after_id).limit(page_size)).all()
+
+        return RosterPage(
+            items=[PersonRef.model_validate(row) for row in rows],
+            page_size=page_size,
+            next_cursor=self.encode_cursor(rows[-1].id) if len(rows) == page_size else None
+        )
+
+    def stream_subject_roster(self, db: Session, subject_id: int, roster: str):
+        # yield_per fetches through a server-side cursor, ROSTER_STREAM_BATCH rows at a time
+        result = db.execute(
+            self.roster_statement(subject_id, roster).execution_options(yield_per=self.ROSTER_STREAM_BATCH)
+        )
+        for row in result:
+            yield json.dumps(dict(row._mapping)) + "\n"
+
+    async def stream_subject_roster_async(self, db: AsyncSession, subject_id: int, roster: str):
+        result = await db.stream(
+            self.roster_statement(subject_id, roster).execution_options(yield_per=self.ROSTER_STREAM_BATCH)
+        )
+        async for row in result:
+            yield json.dumps(dict(row._mapping)) + "\n"
 
     def insert_subject(self, db: Session, name: str):
         subject = Subject(name=name)
         db.add(subject)
         db.commit()
+        self.invalidate_count(Subject)
         db.refresh(subject)
         return subject
 
@@ -223,6 +854,84 @@ class SubjectOperations(BaseOperations):
 
         if "name" in subject_data:
             subject.name = subject_data["name"]
+
+        # Student and teacher views embed the subject name
+        enrolled = select(student_subject.c.student_id).where(student_subject.c.subject_id == subject_id)
+        assigned = select(teacher_subject.c.teacher_id).where(teacher_subject.c.subject_id == subject_id)
+        self.bump_versions(db, Subject, [subject_id])
+        self.bump_versions(db, Student, enrolled)
+        self.bump_versions(db, Teacher, assigned)
         
         db.commit()
-        return self.get_subject_data(db, subject_id)
\ No newline at end of file
+        self.cache.invalidate("subject", [subject_id])
+        self.cache.invalidate("student", [student_id for (student_id,) in db.execute(enrolled)])
+        self.cache.invalidate("teacher", [teacher_id for (teacher_id,) in db.execute(assigned)])
+        return self.get_subject_data(db, subject_id)
+class SearchOperations(BaseOperations):
+    # Mirrors migrations.SEARCH_SOURCES: FTS rowid = id * 2 + kind
+    KINDS = {"student": (0, Student), "teacher": (1, Teacher)}
+    SEARCH_TABLE = "people_search"
+    _fts_available = None
+
+    def search(self, db: Session, q: str, kind: Optional[str] = None, page: int = 1, page_size: int = 10):
+        terms = re.findall(r"\w+", q.lower())
+        if not terms:
+            raise HTTPException(status_code=400, detail="Search query must contain letters or digits")
+        if kind is not None and kind not in self.KINDS:
+            raise HTTPException(status_code=400, detail=f"Unknown type '{kind}'")
+        if page < 1:
+            raise HTTPException(status_code=400, detail="Page number must be greater than 0")
+        self.validate_page_size(page_size)
+
+        # One extra row tells us whether another page exists without counting matches
+        offset, limit = (page - 1) * page_size, page_size + 1
+        if self.fts_available(db):
+            items = self.search_fts(db, terms, kind, offset, limit)
+        else:
+            items = self.search_prefix(db, q.lower().strip(), kind, offset, limit)
+
+        return SearchPage(items=items[:page_size], page=page, page_size=page_size, has_more=len(items) > page_size)
+
+    def fts_available(self, db: Session) -> bool:
+        if SearchOperations._fts_available is None:
+            bind = db.get_bind()
+            SearchOperations._fts_available = (
+                bind.dialect.name == "sqlite" and inspect(bind).has_table(self.SEARCH_TABLE)
+            )
+        return SearchOperations._fts_available
+
+    def search_fts(self, db: Session, terms: List[str], kind: Optional[str], offset: int, limit: int):
+        # Every term must match, each as a prefix, ranked by bm25
+        match = " ".join(f'"{term}"*' for term in terms)
+        kind_filter = f"AND rowid % 2 = {self.KINDS[kind][0]}" if kind else ""
+        rows = db.execute(text(
+            f"SELECT rowid, name, email, bm25({self.SEARCH_TABLE}) AS rank FROM {self.SEARCH_TABLE} "
+            f"WHERE {self.SEARCH_TABLE} MATCH :match {kind_filter} "
+            "ORDER BY rank LIMIT :limit OFFSET :offset"
+        ), {"match": match, "limit": limit, "offset": offset}).all()
+
+        return [
+            SearchHit(
+                type="teacher" if row.rowid % 2 else "student",
+                id=row.rowid // 2,
+                name=row.name,
+                email=row.email,
+                score=-row.rank
+            )
+            for row in rows
+        ]
+
+    def search_prefix(self, db: Session, prefix: str, kind: Optional[str], offset: int, limit: int):
+        # A range instead of LIKE so any btree index on lower(column) can serve it
+        upper = prefix + "\uffff"
+        selects = [
+            select(literal(name).label("type"), model.id, model.name, model.email)
+            .where(or_(
+                and_(func.lower(model.name) >= prefix, func.lower(model.name) < upper),
+                and_(func.lower(model.email) >= prefix, func.lower(model.email) < upper)
+            ))
+            for name, (_, model) in self.KINDS.items()
+            if kind in (None, name)
+        ]
+        statement = union_all(*selects).order_by("name", "id").limit(limit).offset(offset)
+        return [SearchHit.model_validate(row) for row in db.execute(statement)]
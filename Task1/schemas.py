@@ -1,6 +1,9 @@
-from pydantic import BaseModel
-from typing import List
+from pydantic import BaseModel, ConfigDict
+from typing import Any, Dict, Generic, List, TypeVar
 from typing import Optional
+from datetime import datetime
+
+T = TypeVar("T")
 
 class StudentBase(BaseModel):
     name: str
@@ -23,4 +26,191 @@ class TeacherPatchSchema(BaseModel):
 class StudentPatchSchema(BaseModel):
     name: Optional[str] = None
     email: Optional[str] = None
-    subject_ids: Optional[List[int]] = None
\ No newline at end of file
+    subject_ids: Optional[List[int]] = None
+
+class StudentEnrollmentSchema(BaseModel):
+    student_ids: List[int]
+    subject_ids: List[int]
+
+class TeacherAssignmentSchema(BaseModel):
+    teacher_ids: List[int]
+    subject_ids: List[int]
+
+class BatchRequest(BaseModel):
+    ids: List[int]
+
+# Response models. from_attributes lets them be built straight from ORM objects and rows.
+class SubjectRef(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    name: str
+
+class PersonRef(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    name: str
+    email: str
+
+class StudentOut(PersonRef):
+    version: int
+    subjects: List[SubjectRef]
+
+class TeacherOut(PersonRef):
+    version: int
+    subjects: List[SubjectRef]
+
+class SubjectSummary(SubjectRef):
+    version: int
+    student_count: int
+    teacher_count: int
+
+class Page(BaseModel, Generic[T]):
+    items: List[T]
+    total: Optional[int] = None
+    page_size: int
+    next_cursor: Optional[str] = None
+    page: Optional[int] = None
+    pages: Optional[int] = None
+
+class Batch(BaseModel, Generic[T]):
+    items: List[T]
+    missing: List[int]
+
+class SubjectEnrollmentStats(SubjectRef):
+    student_count: int
+    teacher_count: int
+    students_per_teacher: Optional[float] = None
+
+class HistogramBucket(BaseModel):
+    subjects: int
+    count: int
+
+class SubjectHistogram(BaseModel):
+    total: int
+    mean: float
+    buckets: List[HistogramBucket]
+
+class RosterPage(BaseModel):
+    items: List[PersonRef]
+    page_size: int
+    next_cursor: Optional[str] = None
+
+class StudentCreated(BaseModel):
+    student_id: int
+    successfully_linked_subjects: List[SubjectRef]
+    failed_subjects: List[int]
+
+class TeacherCreated(BaseModel):
+    teacher_id: int
+    successfully_linked_subjects: List[SubjectRef]
+    failed_subjects: List[int]
+
+class StudentEnrollmentResult(BaseModel):
+    linked: int
+    missing_student_ids: List[int]
+    missing_subject_ids: List[int]
+
+class TeacherAssignmentResult(BaseModel):
+    linked: int
+    missing_teacher_ids: List[int]
+    missing_subject_ids: List[int]
+
+class SearchHit(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    type: str
+    id: int
+    name: str
+    email: str
+    score: Optional[float] = None
+
+class SearchPage(BaseModel):
+    items: List[SearchHit]
+    page: int
+    page_size: int
+    has_more: bool
+
+class CacheStats(BaseModel):
+    enabled: bool
+    hits: int
+    misses: int
+    hit_ratio: float
+    invalidations: int
+    size: Optional[int] = None
+
+class RouteMetrics(BaseModel):
+    requests: int
+    statements: int
+    max_statements: int
+    avg_statements: float
+    db_time_ms: float
+    avg_db_time_ms: float
+    total_time_ms: float
+    avg_total_time_ms: float
+    nplus1_warnings: int
+
+class SlowStatement(BaseModel):
+    duration_ms: float
+    route: str
+    statement: str
+
+class SqlMetrics(BaseModel):
+    routes: Dict[str, RouteMetrics]
+    slowest_statements: List[SlowStatement]
+    nplus1_threshold: int
+
+class CsvImportSuccess(BaseModel):
+    row_number: int
+    name: str
+    email: str
+    student_id: int
+
+class CsvImportFailure(BaseModel):
+    row_number: int
+    row: Dict[Optional[str], Any]
+    error: str
+
+class CsvImportSkip(BaseModel):
+    row_number: int
+    row: Dict[Optional[str], Any]
+    reason: str
+
+class CsvImportResults(BaseModel):
+    successful: List[CsvImportSuccess]
+    failed: List[CsvImportFailure]
+    skipped: List[CsvImportSkip]
+
+class CsvImportSummary(BaseModel):
+    total_rows: int
+    successful: int
+    failed: int
+    skipped: int
+
+class CsvImportResponse(BaseModel):
+    summary: CsvImportSummary
+    results: CsvImportResults
+
+class ImportJobRowError(BaseModel):
+    row_number: int
+    kind: str
+    row: Dict[Optional[str], Any]
+    message: str
+
+class ImportJobStatus(BaseModel):
+    id: str
+    status: str
+    filename: str
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    bytes_total: int
+    bytes_processed: int
+    progress: float
+    rows_processed: int
+    successful: int
+    failed: int
+    skipped: int
+    error: Optional[str] = None
+    errors: List[ImportJobRowError] = []
@@ -0,0 +1,22 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The app reads its settings at import: point everything at throwaway files first
+_workdir = tempfile.mkdtemp()
+os.environ["SCHOOL_DATABASE_URL"] = f"sqlite:///{_workdir}/school.db"
+os.environ.pop("SCHOOL_READ_DATABASE_URL", None)
+os.environ["SCHOOL_JOBS_DATABASE_URL"] = f"sqlite:///{_workdir}/jobs.db"
+os.environ["SCHOOL_JOBS_SPOOL_DIR"] = os.path.join(_workdir, "uploads")
+
+@pytest.fixture(scope="session")
+def db_engine():
+    from database import engine
+    from migrations import upgrade
+
+    upgrade(engine)
+    return engine
@@ -0,0 +1,30 @@
+from database import SessionLocal
+from models import Student, Subject
+from operations import StudentOperations
+from schemas import StudentBase
+
+def test_bulk_insert_students_reports_each_row(db_engine):
+    with SessionLocal() as db:
+        subject = Subject(name="Bulk Chemistry")
+        db.add_all([subject, Student(name="Taken", email="taken@bulk.test")])
+        db.commit()
+        subject_id = subject.id
+
+        rows = [
+            (2, StudentBase(name="Ann", email="ann@bulk.test", subject_ids=[subject_id, subject_id])),
+            (3, StudentBase(name="Taken", email="taken@bulk.test", subject_ids=[])),
+            (4, StudentBase(name="Ann again", email="ann@bulk.test", subject_ids=[])),
+            (5, StudentBase(name="Bo", email="bo@bulk.test", subject_ids=[999999]))
+        ]
+        successful, failed = StudentOperations().bulk_insert_students(db, rows)
+
+        assert [(row_number, student.email) for row_number, student, _ in successful] == [
+            (2, "ann@bulk.test"), (5, "bo@bulk.test")
+        ]
+        assert failed == [
+            (3, "Email already exists in the database"),
+            (4, "Email already exists in the database")
+        ]
+        ann = db.get(Student, successful[0][2])
+        assert [linked.id for linked in ann.subjects] == [subject_id]
+        assert db.get(Student, successful[1][2]).subjects == []
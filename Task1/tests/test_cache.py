@@ -0,0 +1,46 @@
+import cache
+from cache import EntityCache, LRUBackend
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def test_entries_expire_after_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "monotonic", clock)
+    entity_cache = EntityCache(LRUBackend(ttl=30))
+
+    entity_cache.set("student", 1, {"version": 1})
+    clock.now += 29
+    assert entity_cache.get("student", 1) == {"version": 1}
+    clock.now += 1
+    assert entity_cache.get("student", 1) is None
+    assert len(entity_cache.backend) == 0
+    assert entity_cache.stats()["misses"] == 1
+
+def test_set_restarts_the_ttl(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "monotonic", clock)
+    backend = LRUBackend(ttl=30)
+
+    backend.set("key", "old")
+    clock.now += 20
+    backend.set("key", "new")
+    clock.now += 20
+    assert backend.get("key") == "new"
+
+def test_no_ttl_keeps_entries_until_evicted(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "monotonic", clock)
+    backend = LRUBackend(max_size=2)
+
+    backend.set("a", 1)
+    clock.now += 10 ** 6
+    assert backend.get("a") == 1
+    backend.set("b", 2)
+    backend.set("c", 3)
+    assert backend.get("a") is None
+    assert backend.get("c") == 3
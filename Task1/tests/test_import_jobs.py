@@ -0,0 +1,107 @@
+import io
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func
+
+from database import SessionLocal
+from jobs import COMPLETED, QUEUED, RUNNING, ImportJob, ImportJobQueue
+from models import Student
+
+ROWS = 50
+
+class NoExecutor:
+    """Keeps submitted jobs queued so the test decides who runs them."""
+    def submit(self, fn, *args):
+        pass
+
+    def shutdown(self, **kwargs):
+        pass
+
+@pytest.fixture
+def queues(db_engine, tmp_path):
+    url = f"sqlite:///{tmp_path}/jobs.db"
+    created = []
+
+    def make(lease_seconds=60):
+        queue = ImportJobQueue(url=url, spool_dir=str(tmp_path / "uploads"), workers=1, lease_seconds=lease_seconds)
+        queue.start()
+        queue.executor.shutdown()
+        queue.executor = NoExecutor()
+        created.append(queue)
+        return queue
+
+    yield make
+    for queue in created:
+        queue.shutdown()
+
+def submit_csv(queue, prefix):
+    rows = "".join(f"Student {i},{prefix}{i}@jobs.test\n" for i in range(ROWS))
+    return queue.submit(io.BytesIO(("name,email\n" + rows).encode()), "students.csv")["id"]
+
+def imported(prefix):
+    with SessionLocal() as db:
+        return db.query(func.count(Student.id)).filter(Student.email.like(f"{prefix}%")).scalar()
+
+def test_concurrent_workers_import_a_job_once(queues):
+    first, second = queues(), queues()
+    job_id = submit_csv(first, "race")
+
+    workers = [threading.Thread(target=queue.run, args=(job_id,)) for queue in (first, second)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    job = first.get_job(job_id)
+    assert job["status"] == COMPLETED
+    assert job["successful"] == ROWS
+    assert job["failed"] == 0
+    assert imported("race") == ROWS
+
+def test_start_leaves_running_jobs_with_live_heartbeat(queues):
+    first = queues()
+    job_id = submit_csv(first, "lease")
+    assert first.claim(job_id) is not None
+
+    # A second process starting up must not take over a job that is still being imported
+    second = queues()
+    assert second.claim(job_id) is None
+
+    with first.JobSession() as db:
+        db.get(ImportJob, job_id).heartbeat_at = datetime.utcnow() - timedelta(minutes=5)
+        db.commit()
+    assert second.claim(job_id) is not None
+    assert first.get_job(job_id)["status"] == RUNNING
+
+def test_finished_jobs_are_not_claimed(queues):
+    queue = queues()
+    job_id = submit_csv(queue, "done")
+    assert queue.get_job(job_id)["status"] == QUEUED
+    queue.run(job_id)
+    assert queue.get_job(job_id)["status"] == COMPLETED
+    assert queue.claim(job_id) is None
+    assert imported("done") == ROWS
+
+def test_restart_inside_the_lease_resumes_once_it_expires(queues, tmp_path):
+    crashed = queues()
+    job_id = submit_csv(crashed, "restart")
+    assert crashed.claim(job_id) is not None  # the worker dies right after claiming
+
+    # Restarted straight away: the lease is still live at startup, so only the sweep can resume the job
+    restarted = ImportJobQueue(
+        url=crashed.url, spool_dir=str(tmp_path / "uploads"), workers=1, lease_seconds=1, sweep_seconds=0.1
+    )
+    restarted.start()
+    try:
+        assert restarted.get_job(job_id)["status"] == RUNNING
+        deadline = time.monotonic() + 10
+        while restarted.get_job(job_id)["status"] != COMPLETED and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        restarted.shutdown()
+
+    assert restarted.get_job(job_id)["status"] == COMPLETED
+    assert imported("restart") == ROWS
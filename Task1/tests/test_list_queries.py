@@ -0,0 +1,47 @@
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import sessionmaker
+
+import datagen
+from database import make_engine
+from models import student_subject, teacher_subject
+from operations import StudentOperations, SubjectOperations, TeacherOperations
+
+PAGE_SIZES = [1, 10, 50]
+
+@pytest.fixture(scope="module")
+def Session(tmp_path_factory):
+    engine = make_engine(f"sqlite:///{tmp_path_factory.mktemp('lists')}/school.db")
+    datagen.generate(students=200, teachers=100, subjects=120, bind=engine)
+    return sessionmaker(bind=engine)
+
+def statements_per_page(Session, list_page, page_size):
+    statements = []
+    engine = Session.kw["bind"]
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    with Session() as db:
+        list_page(db, page=1, page_size=page_size)  # warm the cached total
+        event.listen(engine, "before_cursor_execute", listener)
+        try:
+            page = list_page(db, page=2, page_size=page_size)
+        finally:
+            event.remove(engine, "before_cursor_execute", listener)
+    assert len(page.items) == page_size
+    return len(statements)
+
+@pytest.mark.parametrize("list_page", [
+    StudentOperations().get_students,
+    TeacherOperations().get_teachers,
+    SubjectOperations().get_subjects
+], ids=["students", "teachers", "subjects"])
+def test_statement_count_does_not_grow_with_page_size(Session, list_page):
+    counts = [statements_per_page(Session, list_page, page_size) for page_size in PAGE_SIZES]
+    assert counts == [counts[0]] * len(PAGE_SIZES)
+
+def test_subject_pages_carry_roster_counts(Session):
+    with Session() as db:
+        page = SubjectOperations().get_subjects(db, page=1, page_size=50)
+        for subject in page.items:
+            assert subject.student_count == db.query(student_subject).filter_by(subject_id=subject.id).count()
+            assert subject.teacher_count == db.query(teacher_subject).filter_by(subject_id=subject.id).count()
+        assert not hasattr(page.items[0], "students")
@@ -0,0 +1,63 @@
+import pytest
+
+from database import make_engine
+from migrations import upgrade
+
+# Schema created by the original models: association tables without a primary key,
+# no version column, email unique but not indexed
+OLD_LAYOUT = [
+    "CREATE TABLE students (id INTEGER NOT NULL PRIMARY KEY, name VARCHAR, email VARCHAR UNIQUE)",
+    "CREATE INDEX ix_students_id ON students (id)",
+    "CREATE TABLE teachers (id INTEGER NOT NULL PRIMARY KEY, name VARCHAR, email VARCHAR UNIQUE)",
+    "CREATE INDEX ix_teachers_id ON teachers (id)",
+    "CREATE TABLE subjects (id INTEGER NOT NULL PRIMARY KEY, name VARCHAR)",
+    "CREATE INDEX ix_subjects_id ON subjects (id)",
+    "CREATE TABLE student_subject (student_id INTEGER REFERENCES students (id), "
+    "subject_id INTEGER REFERENCES subjects (id))",
+    "CREATE TABLE teacher_subject (teacher_id INTEGER REFERENCES teachers (id), "
+    "subject_id INTEGER REFERENCES subjects (id))",
+    "INSERT INTO students (id, name, email) VALUES (1, 'Ann', 'ann@example.com')",
+    "INSERT INTO teachers (id, name, email) VALUES (1, 'Tom', 'tom@example.com')",
+    "INSERT INTO subjects (id, name) VALUES (1, 'Math')",
+    "INSERT INTO student_subject VALUES (1, 1), (1, 1)",
+    "INSERT INTO teacher_subject VALUES (1, 1)"
+]
+
+@pytest.fixture(scope="module", params=["fresh", "migrated"])
+def engine(request, tmp_path_factory):
+    engine = make_engine(f"sqlite:///{tmp_path_factory.mktemp(request.param)}/school.db")
+    if request.param == "migrated":
+        with engine.begin() as conn:
+            for statement in OLD_LAYOUT:
+                conn.exec_driver_sql(statement)
+    upgrade(engine)
+    yield engine
+    engine.dispose()
+
+def query_plan(engine, statement):
+    with engine.connect() as conn:
+        return " ".join(row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", (1,)))
+
+def primary_key_index(engine, table):
+    with engine.connect() as conn:
+        return next(row[1] for row in conn.exec_driver_sql(f"PRAGMA index_list({table})") if row[3] == "pk")
+
+@pytest.mark.parametrize("table, person", [("student_subject", "student_id"), ("teacher_subject", "teacher_id")])
+def test_subject_to_people_uses_subject_index(engine, table, person):
+    plan = query_plan(engine, f"SELECT {person} FROM {table} WHERE subject_id = ?")
+    assert f"COVERING INDEX ix_{table}_subject_id (subject_id=?)" in plan
+
+@pytest.mark.parametrize("table, person", [("student_subject", "student_id"), ("teacher_subject", "teacher_id")])
+def test_person_to_subjects_uses_primary_key(engine, table, person):
+    plan = query_plan(engine, f"SELECT subject_id FROM {table} WHERE {person} = ?")
+    assert f"COVERING INDEX {primary_key_index(engine, table)} ({person}=?)" in plan
+
+@pytest.mark.parametrize("table", ["students", "teachers"])
+def test_email_lookup_uses_email_index(engine, table):
+    plan = query_plan(engine, f"SELECT id FROM {table} WHERE email = ?")
+    assert f"INDEX ix_{table}_email (email=?)" in plan
+
+def test_migrated_enrollments_are_deduplicated(engine):
+    with engine.connect() as conn:
+        pairs = conn.exec_driver_sql("SELECT student_id, subject_id FROM student_subject").all()
+    assert len(pairs) == len(set(pairs))
@@ -0,0 +1,17 @@
+from fastapi.testclient import TestClient
+
+import main
+from instrumentation import metrics_registry
+
+def test_unmatched_requests_share_one_metrics_key(db_engine):
+    client = TestClient(main.app)
+    before = set(metrics_registry.snapshot()["routes"])
+
+    for i in range(3):
+        assert client.get(f"/nope/{i}").status_code == 404
+    client.request("FOO", f"/nope/{i}")
+    client.request("BAR", "/students/")
+
+    routes = metrics_registry.snapshot()["routes"]
+    assert set(routes) - before <= {"GET <unmatched>", "OTHER <unmatched>", "OTHER /students/"}
+    assert routes["GET <unmatched>"]["requests"] >= 3
@@ -1,10 +1,7 @@
 from fastapi import FastAPI, HTTPException, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
 from typing import Dict
-import pandas as pd
-import io
 import logging
-from metrics_calculator import MetricsCalculator
 from database import Database
 from config import Config
 
@@ -18,6 +15,7 @@ logging.basicConfig(
 )
 
 app = FastAPI(title="Creator Metrics API", version=Config.API_VERSION)
+# Creating the engine does not connect; the first request (or startup hook) does
 db = Database()
 logger = logging.getLogger(__name__)
 
@@ -30,23 +28,36 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+def create_tables():
+    # Deployments that create the schema up front (python database.py) set MIGRATE_ON_STARTUP=false
+    if Config.MIGRATE_ON_STARTUP:
+        db.create_tables()
+
 @app.get("/")
 async def root():
     return {"message": "Creator Metrics API is running", "version": Config.API_VERSION}
 
 @app.post("/api/v1/metrics/compute")
-async def compute_metrics(
+def compute_metrics(
     profile_file: UploadFile = File(...),
-    posts_file: UploadFile = File(...)
+    posts_file: UploadFile = File(...),
+    batch: bool = False
 ) -> Dict:
+    # pandas and the calculator are only needed here, so workers that never
+    # compute do not pay for importing them
+    import pandas as pd
+    from metrics_calculator import MetricsCalculator, read_posts
+
+    # Uploads are already spooled to temporary files; they are parsed straight
+    # from there (in the threadpool, as this is a plain def) instead of being
+    # read into memory first
     try:
         # Read CSV files
         try:
-            profile_content = await profile_file.read()
-            posts_content = await posts_file.read()
-            
-            profile_df = pd.read_csv(io.StringIO(profile_content.decode()))
-            posts_df = pd.read_csv(io.StringIO(posts_content.decode()))
+            profile_df = pd.read_csv(profile_file.file)
+            posts_columns = pd.read_csv(posts_file.file, nrows=0).columns
+            posts_file.file.seek(0)
         except Exception as e:
             logger.error(f"Error reading CSV files: {str(e)}")
             raise HTTPException(
@@ -57,8 +68,6 @@ async def compute_metrics(
         # Validate input data
         if len(profile_df) == 0:
             raise HTTPException(status_code=400, detail="Profile data is empty")
-        if len(posts_df) == 0:
-            raise HTTPException(status_code=400, detail="Posts data is empty")
 
         # Validate required columns in profile data
         required_profile_columns = ['username', 'profile_url', 'country', 'followers']
@@ -72,17 +81,50 @@ async def compute_metrics(
         # Validate required columns in posts data
         required_posts_columns = [
             'description', 'pub_date', 'like_count', 'comment_count',
-            'view_count', 'play_count', 'product_type', 'saves'
+            'view_count', 'play_count', 'share_count', 'product_type', 'saves'
         ]
-        missing_posts_columns = [col for col in required_posts_columns if col not in posts_df.columns]
+        if batch:
+            # Posts are matched to their profile row by username
+            required_posts_columns.append('username')
+        missing_posts_columns = [col for col in required_posts_columns if col not in posts_columns]
         if missing_posts_columns:
             raise HTTPException(
                 status_code=400,
                 detail=f"Missing required columns in posts data: {missing_posts_columns}"
             )
 
-        # Calculate metrics
-        calculator = MetricsCalculator(posts_df, profile_df)
+        # Calculate metrics, parsing and aggregating the posts one chunk at a time
+        try:
+            calculator = MetricsCalculator(read_posts(posts_file.file, posts_columns), profile_df, by_username=batch)
+        except (pd.errors.ParserError, UnicodeDecodeError, ValueError) as e:
+            logger.error(f"Error reading CSV files: {str(e)}")
+            raise HTTPException(
+                status_code=400,
+                detail=f"Error reading CSV files: {str(e)}"
+            )
+        if calculator.post_count == 0:
+            raise HTTPException(status_code=400, detail="Posts data is empty")
+
+        if batch:
+            results = calculator.calculate_batch_metrics()
+            if not db.save_batch_metrics(results):
+                raise HTTPException(
+                    status_code=500,
+                    detail="Failed to save metrics to database"
+                )
+
+            return {
+                "message": "Metrics computed and saved successfully",
+                "creators": len(results),
+                "results": [
+                    {
+                        "overall_metrics": overall_metrics,
+                        "content_type_metrics": content_type_metrics
+                    }
+                    for overall_metrics, content_type_metrics in results
+                ]
+            }
+
         overall_metrics, content_type_metrics = calculator.calculate_metrics()
 
         # Save to database
@@ -0,0 +1,102 @@
+"""Peak memory of reading a large posts upload for /metrics/compute.
+
+Writes a seeded posts CSV with all 23 export columns (--rows rows, reused if
+--path already exists), then processes it in a fresh interpreter per mode and
+reports wall time and peak RSS:
+
+  legacy     read the whole file, decode it, read_csv every column, calculate
+  streaming  read_posts: needed columns only, compact dtypes, chunked aggregation
+
+    python bench_ingest.py --rows 5000000 --path /tmp/posts_5m.csv
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+LONG_DESCRIPTION = (
+    "الهوية الجديدة 💚 بالتعاون مع الفريق، رايكم؟ و نزلت حلقة سوالف و طبخ "
+    "نسخة كأس العالم، مشاهدة ممتعة 🤝🏻 #طبخ #سوالف #رمضان"
+)
+
+def write_posts(path: str, rows: int, chunk_rows: int = 500000):
+    import numpy as np
+    from bench_metrics import make_posts
+
+    written = 0
+    while written < rows:
+        count = min(chunk_rows, rows - written)
+        posts = make_posts(count, seed=written)
+        posts["description"] = posts["description"] + " " + LONG_DESCRIPTION
+        ids = np.arange(written, written + count)
+        posts.insert(0, "profile_url", "https://www.instagram.com/bench_creator")
+        posts.insert(1, "username", "bench_creator")
+        posts.insert(2, "user_id", 5343753941)
+        posts.insert(3, "post_id", 3474392577206174814 - ids)
+        posts.insert(4, "post_url", [f"https://www.instagram.com/p/{i:x}/" for i in ids])
+        posts["duration"] = 31.5
+        posts["tagged_users"] = "shaddahstudio"
+        posts["mentions"] = "shaddahstudio"
+        posts["hashtags"] = "طبخ,سوالف"
+        posts["location"] = np.nan
+        posts["is_ads"] = np.nan
+        posts["saved_at"] = "2024-10-09 06:58:13"
+        posts["sila_id"] = ids
+        posts["from_model"] = 0
+        posts.to_csv(path, mode="a" if written else "w", header=not written, index=False)
+        written += count
+
+def measure(mode: str, path: str) -> dict:
+    import io
+    import pandas as pd
+    from bench_metrics import make_profile
+    from metrics_calculator import MetricsCalculator, read_posts
+
+    started = time.perf_counter()
+    if mode == "legacy":
+        with open(path, "rb") as upload:
+            content = upload.read()
+        posts = pd.read_csv(io.StringIO(content.decode()))
+    else:
+        upload = open(path, "rb")
+        columns = pd.read_csv(upload, nrows=0).columns
+        upload.seek(0)
+        posts = read_posts(upload, columns)
+    overall_metrics, _ = MetricsCalculator(posts, make_profile()).calculate_metrics()
+    return {
+        "seconds": round(time.perf_counter() - started, 2),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "total_posts": overall_metrics["total_posts"]
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--path", default=os.path.join(tempfile.gettempdir(), "bench_posts.csv"))
+    parser.add_argument("--modes", nargs="+", default=["legacy", "streaming"])
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(measure(args.worker, args.path)))
+        return
+
+    if not os.path.exists(args.path):
+        write_posts(args.path, args.rows)
+    print(f"file {os.path.getsize(args.path) / 2**20:.0f} MB")
+    for mode in args.modes:
+        output = subprocess.run(
+            [sys.executable, __file__, "--worker", mode, "--path", args.path],
+            capture_output=True, text=True, check=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{mode:10s} {result['seconds']:8.2f}s  peak RSS {result['peak_rss_mb']:8.1f} MB  posts {result['total_posts']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Time MetricsCalculator on a large synthetic posts frame.
+
+Builds --posts seeded posts for one creator (dates spread over the last 120
+days, a share of sponsored descriptions, missing counters) and reports the
+median time to construct the calculator (date parsing, window filter, paid
+detection) and to run calculate_metrics over --rounds runs.
+
+    python bench_metrics.py --posts 1000000 --rounds 5
+"""
+import argparse
+import os
+import statistics
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import numpy as np
+import pandas as pd
+from metrics_calculator import MetricsCalculator
+
+DESCRIPTIONS = [
+    "New video is up, link in bio",
+    "Weekend with the family",
+    "In collaboration with @brand",
+    "اعلان | تجربتي مع المنتج الجديد",
+    "Recipe of the week 🍲",
+    "Thanks for 500k!"
+]
+PRODUCT_TYPES = ["Video", "Photo", "Image", "Sidecar"]
+
+def make_posts(count: int, seed: int = 7) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    now = pd.Timestamp.now(tz="UTC")
+    posts = pd.DataFrame({
+        "description": pd.Series(DESCRIPTIONS).iloc[rng.integers(0, len(DESCRIPTIONS), count)].to_numpy(),
+        "pub_date": (now - pd.to_timedelta(rng.integers(0, 120 * 86400, count), unit="s")).astype(str),
+        "product_type": pd.Series(PRODUCT_TYPES).iloc[rng.integers(0, len(PRODUCT_TYPES), count)].to_numpy(),
+        "like_count": rng.integers(0, 50000, count),
+        "comment_count": rng.integers(0, 2000, count)
+    })
+    for column, high in (("view_count", 500000), ("play_count", 800000), ("share_count", 3000), ("saves", 5000)):
+        values = rng.integers(0, high, count).astype(float)
+        values[rng.random(count) < 0.2] = np.nan
+        posts[column] = values
+    return posts
+
+def make_profile() -> pd.DataFrame:
+    return pd.DataFrame([{
+        "username": "bench_creator",
+        "profile_url": "https://www.instagram.com/bench_creator",
+        "country": "Saudi Arabia",
+        "followers": 534223
+    }])
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--posts", type=int, default=1000000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    posts, profile = make_posts(args.posts), make_profile()
+    construct, calculate = [], []
+    for _ in range(args.rounds):
+        started = time.perf_counter()
+        calculator = MetricsCalculator(posts.copy(), profile)
+        constructed = time.perf_counter()
+        overall_metrics, content_type_metrics = calculator.calculate_metrics()
+        calculate.append(time.perf_counter() - constructed)
+        construct.append(constructed - started)
+
+    print(f"posts              {args.posts:10d}")
+    print(f"recent posts       {overall_metrics['total_posts']:10d}")
+    print(f"construct_ms       {statistics.median(construct) * 1000:10.1f}")
+    print(f"calculate_ms       {statistics.median(calculate) * 1000:10.1f}")
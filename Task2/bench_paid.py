@@ -0,0 +1,55 @@
+"""Time paid-content detection as the keyword list grows.
+
+For each --keywords size the default keywords are padded with synthetic
+sponsor hashtags and partnership tags, and --posts seeded descriptions are
+classified two ways: the old per-post Python loop (``any(keyword in
+description.lower())``, skipped above --legacy-max keywords) and the compiled
+keyword_pattern matcher. Both must flag the same posts.
+
+    python bench_paid.py --posts 1000000 --keywords 2 50 500 5000
+"""
+import argparse
+import os
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+import pandas as pd
+from bench_metrics import make_posts
+from config import Config
+from metrics_calculator import keyword_pattern
+
+def keywords_of_size(size: int) -> list:
+    keywords = list(Config.PAID_CONTENT_KEYWORDS)
+    for i in range(size - len(keywords)):
+        keywords.append(f"#sponsor{i}" if i % 2 else f"paid partnership with brand{i}")
+    return keywords[:size]
+
+def detect(descriptions: pd.Series, pattern) -> pd.Series:
+    return descriptions.str.casefold().str.contains(pattern, na=False).astype(bool)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--posts", type=int, default=1000000)
+    parser.add_argument("--keywords", type=int, nargs="+", default=[2, 50, 500, 5000])
+    parser.add_argument("--legacy-max", type=int, default=500)
+    args = parser.parse_args()
+
+    descriptions = make_posts(args.posts)["description"]
+    for size in args.keywords:
+        keywords = keywords_of_size(size)
+
+        started = time.perf_counter()
+        pattern = keyword_pattern(keywords)
+        is_paid = detect(descriptions, pattern)
+        vectorized = time.perf_counter() - started
+
+        legacy = None
+        if size <= args.legacy_max:
+            started = time.perf_counter()
+            expected = descriptions.apply(lambda x: any(keyword in str(x).lower() for keyword in keywords))
+            legacy = time.perf_counter() - started
+            assert is_paid.equals(expected), "matchers disagree"
+
+        legacy_ms = f"{legacy * 1000:10.1f}" if legacy is not None else f"{'-':>10s}"
+        print(f"keywords {size:6d}  legacy_ms {legacy_ms}  compiled_ms {vectorized * 1000:10.1f}  paid {int(is_paid.sum())}")
@@ -0,0 +1,65 @@
+"""Time Database.save_batch_metrics for many creators.
+
+Saves --creators synthetic creators (overall row plus four content-type rows
+each) into a fresh database twice, once inserting and once updating, with the
+bulk ON CONFLICT upsert and with the row-by-row ORM path it replaced.
+The tables are dropped and recreated for every mode, so the benchmark never
+uses DATABASE_URL: it runs on a throwaway SQLite file, or on the database
+named by BENCH_DATABASE_URL (for example a scratch PostgreSQL database).
+
+    python bench_save.py --creators 10000
+"""
+import argparse
+import os
+import tempfile
+import time
+
+BENCH_DATABASE_URL = os.getenv("BENCH_DATABASE_URL") or f"sqlite:///{tempfile.mkdtemp()}/bench_save.db"
+if BENCH_DATABASE_URL == os.getenv("DATABASE_URL"):
+    raise SystemExit("BENCH_DATABASE_URL must not be the app's DATABASE_URL: the benchmark drops its tables")
+# Config refuses to load without DATABASE_URL; the benchmark itself only uses BENCH_DATABASE_URL
+os.environ.setdefault("DATABASE_URL", BENCH_DATABASE_URL)
+
+from database import Database
+from models import Base
+
+def make_results(creators: int, seed: int = 0) -> list:
+    results = []
+    for i in range(creators):
+        username = f"creator{i}"
+        base = float(i + seed)
+        metrics = {
+            'active_reach': base * 3, 'emv': base * 11.5, 'avg_engagements': base * 2,
+            'avg_video_views': base * 40, 'avg_saves': base / 2, 'avg_likes': base,
+            'avg_comments': base / 10, 'avg_shares': base / 5, 'total_posts': 25 + i % 50
+        }
+        overall_metrics = {
+            'username': username, 'profile_url': f"https://www.instagram.com/{username}",
+            'country': "Saudi Arabia", 'followers': 1000 + i, **metrics,
+            'avg_story_reach': 0.0, 'avg_story_engagements': 0.0, 'avg_story_views': 0.0
+        }
+        content_type_metrics = [
+            {'username': username, 'content_type': content_type, 'media_type': media_type, **metrics}
+            for content_type in ('paid', 'organic') for media_type in ('video', 'photo')
+        ]
+        results.append((overall_metrics, content_type_metrics))
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--creators", type=int, default=10000)
+    args = parser.parse_args()
+
+    db = Database(BENCH_DATABASE_URL)
+    upsert_insert = db.upsert_insert
+    for mode, insert in (("upsert", upsert_insert), ("row-by-row", None)):
+        Base.metadata.drop_all(db.engine)
+        db.create_tables()
+        db.upsert_insert = insert
+        timings = []
+        for seed in (0, 1):
+            results = make_results(args.creators, seed)
+            started = time.perf_counter()
+            assert db.save_batch_metrics(results)
+            timings.append(time.perf_counter() - started)
+        print(f"{mode:12s} insert {timings[0]:7.2f}s  update {timings[1]:7.2f}s  ({args.creators} creators)")
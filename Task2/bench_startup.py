@@ -0,0 +1,60 @@
+"""Cold start: how long a fresh worker takes to import the app and answer.
+
+Every round starts a new interpreter that imports api, runs the startup
+hooks and serves one request through TestClient (requires httpx), against a
+database that already has the schema, like a worker restart. Reports the
+median import time, time to first response inside the process, and wall time
+including interpreter start-up. Set MIGRATE_ON_STARTUP=false to measure
+workers that skip create_all. DATABASE_URL defaults to a throwaway SQLite
+file.
+
+    python bench_startup.py --rounds 5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+CHILD = """
+import time
+from fastapi.testclient import TestClient
+started = time.perf_counter()
+import api
+imported = time.perf_counter()
+with TestClient(api.app) as client:
+    status = client.get({path!r}).status_code
+print(imported - started, time.perf_counter() - started, status)
+"""
+
+def run_round(path: str, env: dict) -> dict:
+    started = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD.format(path=path)],
+        cwd=os.path.dirname(os.path.abspath(__file__)), env=env,
+        capture_output=True, text=True, check=True
+    ).stdout
+    wall = time.perf_counter() - started
+    import_time, first_response, status = output.split()[-3:]
+    return {
+        "import_ms": float(import_time) * 1000,
+        "first_response_ms": float(first_response) * 1000,
+        "wall_ms": wall * 1000,
+        "status": int(status)
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--path", default="/api/v1/health")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    env = dict(os.environ, DATABASE_URL=os.getenv("DATABASE_URL", f"sqlite:///{workdir}/startup.db"))
+    run_round(args.path, dict(env, MIGRATE_ON_STARTUP="true"))  # creates the schema
+    rounds = [run_round(args.path, env) for _ in range(args.rounds)]
+    for key in ("import_ms", "first_response_ms", "wall_ms"):
+        print(f"{key:18s} {statistics.median(r[key] for r in rounds):8.1f}")
+    print(f"{'status':18s} {rounds[-1]['status']:8d}")
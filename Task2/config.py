@@ -13,6 +13,10 @@ class Config:
     if not DATABASE_URL:
         raise ValueError("No DATABASE_URL set in environment variables")
     
+    # Create missing tables when the API starts; set to false when running
+    # `python database.py` as a separate deploy step
+    MIGRATE_ON_STARTUP = os.getenv('MIGRATE_ON_STARTUP', 'true').lower() in ('1', 'true', 'yes')
+
     # API configuration
     API_VERSION = '1.0'
     API_PREFIX = '/api/v1'
@@ -24,5 +28,17 @@ class Config:
     EMV_LIKE_RATE = 0.09
     EMV_PLAY_RATE = 0.11
     
-    # Content detection
-    PAID_CONTENT_KEYWORDS = ['@', 'اعلان']
\ No newline at end of file
+    # Rows of an uploaded posts file parsed and aggregated at a time
+    POSTS_CHUNK_ROWS = int(os.getenv('POSTS_CHUNK_ROWS', '100000'))
+
+    # Content detection: a post is paid when its description contains any of
+    # these (case-insensitive). PAID_CONTENT_KEYWORDS replaces the defaults with a
+    # comma-separated list; PAID_CONTENT_KEYWORDS_FILE adds one keyword per line
+    # (sponsor hashtags, partnership tags, ...)
+    PAID_CONTENT_KEYWORDS = os.getenv('PAID_CONTENT_KEYWORDS', '@,اعلان').split(',')
+    PAID_CONTENT_KEYWORDS_FILE = os.getenv('PAID_CONTENT_KEYWORDS_FILE')
+    if PAID_CONTENT_KEYWORDS_FILE:
+        with open(PAID_CONTENT_KEYWORDS_FILE, encoding='utf-8') as keywords_file:
+            PAID_CONTENT_KEYWORDS += [line.strip() for line in keywords_file if line.strip()]
+    # Also count posts flagged in the export's is_ads column as paid
+    PAID_CONTENT_USE_IS_ADS = os.getenv('PAID_CONTENT_USE_IS_ADS', 'true').lower() in ('1', 'true', 'yes')
\ No newline at end of file
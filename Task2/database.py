@@ -1,16 +1,22 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.exc import SQLAlchemyError
 from models import CreatorMetrics, ContentTypeMetrics, Base
 from config import Config
-from typing import Dict, List, Optional
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
 import logging
-import numpy as np
+import sys
 from sqlalchemy.sql import text
 
 logger = logging.getLogger(__name__)
 
 def convert_numpy_to_python(value):
+    # Only look for numpy types once something (the calculator) has imported numpy
+    np = sys.modules.get("numpy")
+    if np is None:
+        return value
     if isinstance(value, np.integer):
         return int(value)
     elif isinstance(value, np.floating):
@@ -20,61 +26,49 @@ def convert_numpy_to_python(value):
     return value
 
 class Database:
-    def __init__(self):
-        self.engine = create_engine(Config.DATABASE_URL)
-        Base.metadata.create_all(self.engine)
+    def __init__(self, url: Optional[str] = None):
+        self.engine = create_engine(url or Config.DATABASE_URL)
         self.SessionLocal = sessionmaker(bind=self.engine)
+        # Dialects with INSERT ... ON CONFLICT DO UPDATE; others save row by row
+        self.upsert_insert = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}.get(self.engine.dialect.name)
+
+    def create_tables(self):
+        Base.metadata.create_all(self.engine)
+        self.create_content_type_key()
+
+    def create_content_type_key(self):
+        """Add the (username, content_type, media_type) unique index to a table created before it existed.
+
+        Duplicate rows left by earlier concurrent saves are removed first,
+        keeping the newest one.
+        """
+        key = next(index for index in ContentTypeMetrics.__table__.indexes if index.name == 'uq_content_type_metrics_key')
+        existing = {index['name'] for index in inspect(self.engine).get_indexes(ContentTypeMetrics.__tablename__)}
+        if key.name in existing:
+            return
+        with self.engine.begin() as connection:
+            deleted = connection.execute(text(
+                "DELETE FROM content_type_metrics WHERE id NOT IN ("
+                "SELECT MAX(id) FROM content_type_metrics GROUP BY username, content_type, media_type)"
+            )).rowcount
+            key.create(connection)
+        logger.info(f"Created {key.name}, removed {deleted} duplicate content type row(s)")
 
     def save_metrics(self, overall_metrics: Dict, content_type_metrics: List[Dict]) -> bool:
+        return self.save_batch_metrics([(overall_metrics, content_type_metrics)])
+
+    def save_batch_metrics(self, results: List[Tuple[Dict, List[Dict]]]) -> bool:
+        """Save (overall, content type) metrics for many creators in one transaction."""
         session = self.SessionLocal()
         try:
-            converted_overall_metrics = {
-                key: convert_numpy_to_python(value) 
-                for key, value in overall_metrics.items()
-            }
-
-            converted_content_type_metrics = [
-                {
-                    key: convert_numpy_to_python(value) 
-                    for key, value in metrics.items()
-                }
-                for metrics in content_type_metrics
-            ]
-
-            logger.info(f"Converted Overall Metrics: {converted_overall_metrics}")
-            logger.info(f"Converted Content Type Metrics: {converted_content_type_metrics}")
-
-            # Update or create overall metrics
-            existing_metrics = session.query(CreatorMetrics).filter_by(
-                username=converted_overall_metrics['username']
-            ).first()
-
-            if existing_metrics:
-                for key, value in converted_overall_metrics.items():
-                    if hasattr(existing_metrics, key):
-                        setattr(existing_metrics, key, value)
+            if self.upsert_insert is not None:
+                self._upsert_metrics(session, results)
             else:
-                new_metrics = CreatorMetrics(**converted_overall_metrics)
-                session.add(new_metrics)
-
-            # Update or create content type metrics
-            for metrics in converted_content_type_metrics:
-                existing_content_metrics = session.query(ContentTypeMetrics).filter_by(
-                    username=metrics['username'],
-                    content_type=metrics['content_type'],
-                    media_type=metrics['media_type']
-                ).first()
-
-                if existing_content_metrics:
-                    for key, value in metrics.items():
-                        if hasattr(existing_content_metrics, key):
-                            setattr(existing_content_metrics, key, value)
-                else:
-                    new_content_metrics = ContentTypeMetrics(**metrics)
-                    session.add(new_content_metrics)
+                for overall_metrics, content_type_metrics in results:
+                    self._save_creator_metrics(session, overall_metrics, content_type_metrics)
 
             session.commit()
-            logger.info("Metrics saved successfully")
+            logger.info(f"Metrics saved successfully for {len(results)} creator(s)")
             return True
 
         except SQLAlchemyError as e:
@@ -94,6 +88,85 @@ class Database:
         finally:
             session.close()
 
+    def _upsert_metrics(self, session, results: List[Tuple[Dict, List[Dict]]]):
+        """Write every creator's rows with one INSERT ... ON CONFLICT DO UPDATE per table."""
+        creator_rows, content_type_rows = {}, {}
+        for overall_metrics, content_type_metrics in results:
+            row = self._row(CreatorMetrics, overall_metrics)
+            creator_rows[row['username']] = row
+            for metrics in content_type_metrics:
+                row = self._row(ContentTypeMetrics, metrics)
+                content_type_rows[(row['username'], row['content_type'], row['media_type'])] = row
+
+        # Rows are deduplicated by key above: one statement cannot update the same row twice
+        for model, keys, rows in (
+            (CreatorMetrics, ['username'], list(creator_rows.values())),
+            (ContentTypeMetrics, ['username', 'content_type', 'media_type'], list(content_type_rows.values()))
+        ):
+            if rows:
+                session.execute(self._upsert_statement(model, keys, rows[0].keys()), rows)
+
+    def _row(self, model, metrics: Dict) -> Dict:
+        return {
+            key: convert_numpy_to_python(value)
+            for key, value in metrics.items()
+            if key in model.__table__.columns
+        }
+
+    def _upsert_statement(self, model, keys: List[str], columns):
+        statement = self.upsert_insert(model)
+        updates = {column: statement.excluded[column] for column in columns if column not in keys}
+        if 'updated_at' in model.__table__.columns:
+            # onupdate does not fire for the conflict branch
+            updates['updated_at'] = datetime.now(timezone.utc)
+        return statement.on_conflict_do_update(index_elements=keys, set_=updates)
+
+    def _save_creator_metrics(self, session, overall_metrics: Dict, content_type_metrics: List[Dict]):
+        converted_overall_metrics = {
+            key: convert_numpy_to_python(value) 
+            for key, value in overall_metrics.items()
+        }
+
+        converted_content_type_metrics = [
+            {
+                key: convert_numpy_to_python(value) 
+                for key, value in metrics.items()
+            }
+            for metrics in content_type_metrics
+        ]
+
+        logger.debug(f"Converted Overall Metrics: {converted_overall_metrics}")
+        logger.debug(f"Converted Content Type Metrics: {converted_content_type_metrics}")
+
+        # Update or create overall metrics
+        existing_metrics = session.query(CreatorMetrics).filter_by(
+            username=converted_overall_metrics['username']
+        ).first()
+
+        if existing_metrics:
+            for key, value in converted_overall_metrics.items():
+                if hasattr(existing_metrics, key):
+                    setattr(existing_metrics, key, value)
+        else:
+            new_metrics = CreatorMetrics(**converted_overall_metrics)
+            session.add(new_metrics)
+
+        # Update or create content type metrics
+        for metrics in converted_content_type_metrics:
+            existing_content_metrics = session.query(ContentTypeMetrics).filter_by(
+                username=metrics['username'],
+                content_type=metrics['content_type'],
+                media_type=metrics['media_type']
+            ).first()
+
+            if existing_content_metrics:
+                for key, value in metrics.items():
+                    if hasattr(existing_content_metrics, key):
+                        setattr(existing_content_metrics, key, value)
+            else:
+                new_content_metrics = ContentTypeMetrics(**metrics)
+                session.add(new_content_metrics)
+
     def get_metrics(self, username: str) -> Optional[Dict]:
         session = self.SessionLocal()
         try:
@@ -164,4 +237,9 @@ class Database:
             session.rollback()
             return False
         finally:
-            session.close()
\ No newline at end of file
+            session.close()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    Database().create_tables()
+    logger.info("Tables created")
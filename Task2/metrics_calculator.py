@@ -1,146 +1,281 @@
+import re
 import pandas as pd
 from datetime import datetime, timezone
-from typing import Tuple, Dict, List
+from typing import Tuple, Dict, List, Iterable, Mapping, Optional, Union
 from config import Config
 
+# Post counters the metrics are built from
+SUM_COLUMNS = ['comment_count', 'like_count', 'view_count', 'play_count', 'share_count', 'saves']
+
+# Largest count a single post may report; keeps totals far from int64 overflow
+MAX_POST_COUNTER = 10 ** 12
+
+# Columns read from an uploaded posts file; everything else is skipped while parsing
+POSTS_COLUMNS = ['username', 'description', 'pub_date', 'product_type', 'is_ads', *SUM_COLUMNS]
+POSTS_DTYPES = {
+    **{column: 'Int64' for column in SUM_COLUMNS},
+    'username': 'category',
+    'product_type': 'category'
+}
+
+def keyword_pattern(keywords: Iterable[str]) -> Optional[re.Pattern]:
+    """Compile case-folded keywords into one regex that finds any of them.
+
+    The keywords are merged into a trie first, so at every position of the text
+    only the branch for the next character is tried and matching cost barely
+    grows with the number of keywords (a plain ``a|b|c`` alternation tries
+    each keyword in turn). A keyword that extends another one is dropped,
+    since the shorter one already matches.
+    """
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword.casefold():
+            node = node.setdefault(char, {})
+        node[None] = True
+    if not trie:
+        return None
+
+    def branch(node):
+        if None in node:
+            return ''
+        alternatives = [re.escape(char) + branch(child) for char, child in sorted(node.items())]
+        return alternatives[0] if len(alternatives) == 1 else '(?:' + '|'.join(alternatives) + ')'
+
+    return re.compile(branch(trie))
+
+PAID_CONTENT_PATTERN = keyword_pattern(Config.PAID_CONTENT_KEYWORDS)
+
+def read_posts(file, columns: Iterable[str], chunksize: int = Config.POSTS_CHUNK_ROWS):
+    """Iterate over a posts CSV ``chunksize`` rows at a time, parsing only ``POSTS_COLUMNS``.
+
+    Raises ValueError for counters that are not whole numbers between 0 and
+    MAX_POST_COUNTER.
+    """
+    usecols = [column for column in POSTS_COLUMNS if column in columns]
+    reader = pd.read_csv(
+        file,
+        usecols=usecols,
+        dtype={column: dtype for column, dtype in POSTS_DTYPES.items() if column in usecols},
+        chunksize=chunksize
+    )
+    while True:
+        try:
+            chunk = next(reader)
+        except StopIteration:
+            return
+        except (TypeError, OverflowError) as e:
+            # pandas reports fractional counts as TypeError and huge ones as OverflowError
+            raise ValueError(f"Post counters must be whole numbers between 0 and {MAX_POST_COUNTER}: {e}") from e
+        check_counters(chunk)
+        yield chunk
+
+def check_counters(posts: pd.DataFrame):
+    for column in SUM_COLUMNS:
+        if column not in posts.columns:
+            continue
+        values = posts[column]
+        out_of_range = (values < 0) | (values > MAX_POST_COUNTER)
+        if out_of_range.any():
+            value = values[out_of_range.fillna(False)].iloc[0]
+            raise ValueError(
+                f"Invalid {column} value {value}: post counters must be whole numbers between 0 and {MAX_POST_COUNTER}"
+            )
+
 class MetricsCalculator:
-    def __init__(self, posts_df: pd.DataFrame, profile_df: pd.DataFrame):
-        self.posts_df = posts_df
-        self.profile_df = profile_df
-        
-        self.posts_df['pub_date'] = pd.to_datetime(self.posts_df['pub_date'], utc=True, errors='coerce')
+    def __init__(self, posts: Union[pd.DataFrame, Iterable[pd.DataFrame]], profile_df: pd.DataFrame,
+                 by_username: bool = False):
+        """Aggregate ``posts`` (a frame, or chunks of one from ``read_posts``).
 
-        # Convert timezone-aware dates to UTC
-        self.posts_df['pub_date'] = self.posts_df['pub_date'].dt.tz_convert('UTC').dt.tz_localize(None)
+        Only per-group column sums are kept, so chunks can be dropped as soon
+        as they are aggregated. With ``by_username`` the groups are also split
+        per creator for ``calculate_batch_metrics``.
+        """
+        self.profile_df = profile_df
+        self.by = 'username' if by_username else None
 
         # Get date range in UTC
         self.start_date, self.end_date = self._get_date_range()
-        
-        # Filter posts for last 3 months
-        self.recent_posts = self.posts_df[
-            (self.posts_df['pub_date'] >= self.start_date) & 
-            (self.posts_df['pub_date'] <= self.end_date)
-        ]
-        
-        # Determine paid vs organic content
-        self.recent_posts['is_paid'] = self.recent_posts['description'].apply(
-            lambda x: any(keyword in str(x).lower() for keyword in Config.PAID_CONTENT_KEYWORDS)
-        )
+
+        self.post_count = 0
+        group_sums, group_sizes = [], []
+        for chunk in ([posts] if isinstance(posts, pd.DataFrame) else posts):
+            self.post_count += len(chunk)
+            sums, sizes = self.aggregate(self.recent_posts(chunk), self.by)
+            group_sums.append(sums)
+            group_sizes.append(sizes)
+        self.group_sums, self.group_sizes = self.combine(group_sums), self.combine(group_sizes)
 
     def _get_date_range(self):
         """Get date range in UTC without timezone info"""
         end_date = datetime.now(timezone.utc).replace(tzinfo=None)
         start_date = end_date - pd.Timedelta(days=90)
         return start_date, end_date
-    
-    def calculate_active_reach(self, posts: pd.DataFrame) -> float:
-        if len(posts) == 0:
-            return 0.0
-        total_engagement = (
-            posts['comment_count'].fillna(0) +
-            posts['like_count'].fillna(0) +
-            posts['view_count'].fillna(0)
-        ).sum()
-        return total_engagement / len(posts)
-
-    def calculate_emv(self, posts: pd.DataFrame) -> float:
-        followers = self.profile_df['followers'].iloc[0]
-        total_comments = posts['comment_count'].fillna(0).sum()
-        total_likes = posts['like_count'].fillna(0).sum()
-        total_plays = posts['play_count'].fillna(0).sum()
+
+    def recent_posts(self, posts_df: pd.DataFrame) -> pd.DataFrame:
+        posts_df['pub_date'] = pd.to_datetime(posts_df['pub_date'], utc=True, errors='coerce')
+
+        # Convert timezone-aware dates to UTC
+        posts_df['pub_date'] = posts_df['pub_date'].dt.tz_convert('UTC').dt.tz_localize(None)
+
+        # Filter posts for last 3 months
+        recent_posts = posts_df[
+            (posts_df['pub_date'] >= self.start_date) & 
+            (posts_df['pub_date'] <= self.end_date)
+        ]
         
+        # Determine paid vs organic content
+        recent_posts['is_paid'] = self.detect_paid(recent_posts)
+        return recent_posts
+
+    def detect_paid(self, posts: pd.DataFrame) -> pd.Series:
+        """Flag posts whose description contains a paid-content keyword or that are marked ``is_ads``."""
+        descriptions = posts['description']
+        if not pd.api.types.is_string_dtype(descriptions):
+            # e.g. a chunk where every description is empty and parsed as float
+            descriptions = descriptions.astype('string')
+        if PAID_CONTENT_PATTERN is None:
+            is_paid = pd.Series(False, index=posts.index)
+        else:
+            is_paid = descriptions.str.casefold().str.contains(PAID_CONTENT_PATTERN, na=False).astype(bool)
+
+        if Config.PAID_CONTENT_USE_IS_ADS and 'is_ads' in posts.columns:
+            is_ads = posts['is_ads']
+            if pd.api.types.is_numeric_dtype(is_ads):
+                is_ads = is_ads.notna() & (is_ads != 0)
+            else:
+                is_ads = is_ads.astype('string').str.strip().str.casefold().isin(['1', '1.0', 'true', 'yes'])
+            is_paid |= is_ads.fillna(False).astype(bool)
+        return is_paid
+
+    def aggregate(self, posts: pd.DataFrame, by: Optional[str] = None) -> Tuple[pd.DataFrame, pd.Series]:
+        """Sum every counter column and count posts per ([by,] is_paid, product_type) in one pass."""
+        keys = [posts['is_paid'], posts['product_type']]
+        if by is not None:
+            keys.insert(0, posts[by])
+        counters = posts[SUM_COLUMNS]
+        # Narrow integer columns are summed in 64 bits so totals cannot wrap
+        counters = counters.astype({
+            column: 'Int64' for column in SUM_COLUMNS
+            if pd.api.types.is_extension_array_dtype(counters[column]) and counters[column].dtype.itemsize < 8
+        })
+        groups = counters.groupby(keys, dropna=False, sort=False, observed=True)
+        # Missing counters count as 0: groupby sums skip NaN
+        return groups.sum(), groups.size()
+
+    @staticmethod
+    def combine(parts: List):
+        """Add up per-chunk group sums (or sizes) that share group keys."""
+        if len(parts) == 1:
+            return parts[0]
+        combined = pd.concat(parts)
+        return combined.groupby(level=list(range(combined.index.nlevels)), dropna=False, sort=False, observed=True).sum()
+
+    def calculate_active_reach(self, sums: Mapping, post_count: int) -> float:
+        if post_count == 0:
+            return 0.0
+        return (sums['comment_count'] + sums['like_count'] + sums['view_count']) / post_count
+
+    def calculate_emv(self, sums: Mapping, followers: int) -> float:
         return (
             (followers / 1000 * Config.EMV_FOLLOWER_RATE) +
-            (total_comments * Config.EMV_COMMENT_RATE) +
-            (total_likes * Config.EMV_LIKE_RATE) +
-            (total_plays * Config.EMV_PLAY_RATE)
+            (sums['comment_count'] * Config.EMV_COMMENT_RATE) +
+            (sums['like_count'] * Config.EMV_LIKE_RATE) +
+            (sums['play_count'] * Config.EMV_PLAY_RATE)
         )
 
-    def calculate_average_engagements(self, posts: pd.DataFrame) -> float:
-        if len(posts) == 0:
+    def calculate_average_engagements(self, sums: Mapping, post_count: int) -> float:
+        if post_count == 0:
             return 0.0
-        total_engagement = (
-            posts['like_count'].fillna(0) +
-            posts['comment_count'].fillna(0) +
-            posts['share_count'].fillna(0) +
-            posts['saves'].fillna(0)
-        ).sum()
-        return total_engagement / len(posts)
+        return (sums['like_count'] + sums['comment_count'] + sums['share_count'] + sums['saves']) / post_count
 
-    def calculate_metrics(self) -> Tuple[Dict, List[Dict]]:
+    def post_metrics(self, sums: Mapping, post_count: int, followers: int) -> Dict:
+        """Metrics shared by the overall and per-content-type rows, from column sums."""
+        def average(column):
+            return float(sums[column] / post_count) if post_count > 0 else 0.0
+
+        return {
+            'active_reach': float(self.calculate_active_reach(sums, post_count)),
+            'emv': float(self.calculate_emv(sums, followers)),
+            'avg_engagements': float(self.calculate_average_engagements(sums, post_count)),
+            'avg_video_views': average('view_count'),
+            'avg_saves': average('saves'),
+            'avg_likes': average('like_count'),
+            'avg_comments': average('comment_count'),
+            'avg_shares': average('share_count'),
+            'total_posts': int(post_count)
+        }
+
+    def creator_metrics(self, profile: Mapping, totals: Mapping, post_count: int,
+                        group_sums: Dict, group_sizes: Dict, key: tuple = ()) -> Tuple[Dict, List[Dict]]:
+        """Overall and content-type rows for one profile.
+
+        ``group_sums``/``group_sizes`` come from ``aggregate`` as dicts keyed by
+        ``key + (is_paid, product_type)``.
+        """
+        username = str(profile['username'])
         overall_metrics = {
-            'username': str(self.profile_df['username'].iloc[0]),
-            'profile_url': str(self.profile_df['profile_url'].iloc[0]),
-            'country': str(self.profile_df['country'].iloc[0]),
-            'followers': int(self.profile_df['followers'].iloc[0]),
-            'active_reach': float(self.calculate_active_reach(self.recent_posts)),
-            'emv': float(self.calculate_emv(self.recent_posts)),
-            'avg_engagements': float(self.calculate_average_engagements(self.recent_posts)),
-            'avg_video_views': float(
-                self.recent_posts['view_count'].fillna(0).sum() / 
-                len(self.recent_posts) if len(self.recent_posts) > 0 else 0
-            ),
+            'username': username,
+            'profile_url': str(profile['profile_url']),
+            'country': str(profile['country']),
+            'followers': int(profile['followers']),
+            **self.post_metrics(totals, post_count, profile['followers']),
             'avg_story_reach': 0.0,
             'avg_story_engagements': 0.0,
-            'avg_story_views': 0.0,
-            'avg_saves': float(
-                self.recent_posts['saves'].fillna(0).sum() / 
-                len(self.recent_posts) if len(self.recent_posts) > 0 else 0
-            ),
-            'avg_likes': float(
-                self.recent_posts['like_count'].fillna(0).sum() / 
-                len(self.recent_posts) if len(self.recent_posts) > 0 else 0
-            ),
-            'avg_comments': float(
-                self.recent_posts['comment_count'].fillna(0).sum() / 
-                len(self.recent_posts) if len(self.recent_posts) > 0 else 0
-            ),
-            'avg_shares': float(
-                self.recent_posts['share_count'].fillna(0).sum() / 
-                len(self.recent_posts) if len(self.recent_posts) > 0 else 0
-            ),
-            'total_posts': int(len(self.recent_posts))
+            'avg_story_views': 0.0
         }
 
         # Calculate metrics by content type
         content_type_metrics = []
         for is_paid in [True, False]:
             for media_type in ['Video', 'Photo']:
-                filtered_posts = self.recent_posts[
-                    (self.recent_posts['is_paid'] == is_paid) &
-                    (self.recent_posts['product_type'] == media_type)
-                ]
-                
-                if len(filtered_posts) > 0:
-                    metrics = {
-                        'username': str(self.profile_df['username'].iloc[0]),
+                group = key + (is_paid, media_type)
+                if group in group_sizes:
+                    content_type_metrics.append({
+                        'username': username,
                         'content_type': 'paid' if is_paid else 'organic',
                         'media_type': media_type.lower(),
-                        'active_reach': float(self.calculate_active_reach(filtered_posts)),
-                        'emv': float(self.calculate_emv(filtered_posts)),
-                        'avg_engagements': float(self.calculate_average_engagements(filtered_posts)),
-                        'avg_video_views': float(
-                            filtered_posts['view_count'].fillna(0).sum() / 
-                            len(filtered_posts)
-                        ),
-                        'avg_saves': float(
-                            filtered_posts['saves'].fillna(0).sum() / 
-                            len(filtered_posts)
-                        ),
-                        'avg_likes': float(
-                            filtered_posts['like_count'].fillna(0).sum() / 
-                            len(filtered_posts)
-                        ),
-                        'avg_comments': float(
-                            filtered_posts['comment_count'].fillna(0).sum() / 
-                            len(filtered_posts)
-                        ),
-                        'avg_shares': float(
-                            filtered_posts['share_count'].fillna(0).sum() / 
-                            len(filtered_posts)
-                        ),
-                        'total_posts': int(len(filtered_posts))
-                    }
-                    content_type_metrics.append(metrics)
-        
-        return overall_metrics, content_type_metrics
\ No newline at end of file
+                        **self.post_metrics(group_sums[group], group_sizes[group], profile['followers'])
+                    })
+
+        return overall_metrics, content_type_metrics
+
+    def calculate_metrics(self) -> Tuple[Dict, List[Dict]]:
+        """Metrics for the first profile row, over all posts."""
+        group_sums, group_sizes = self.group_sums, self.group_sizes
+        if self.by is not None:
+            group_sums = group_sums.groupby(level=[1, 2], dropna=False, sort=False, observed=True).sum()
+            group_sizes = group_sizes.groupby(level=[1, 2], dropna=False, sort=False, observed=True).sum()
+        return self.creator_metrics(
+            self.profile_df.iloc[0],
+            group_sums.sum(),
+            int(group_sizes.sum()),
+            group_sums.to_dict('index'),
+            group_sizes.to_dict()
+        )
+
+    def calculate_batch_metrics(self) -> List[Tuple[Dict, List[Dict]]]:
+        """Metrics for every profile row, joined to its posts by ``username``.
+
+        Needs ``by_username=True``. Posts of usernames without a profile row are
+        ignored; a profile without recent posts gets zeroed averages. When a
+        username appears in several profile rows the last one wins.
+        """
+        if self.by != 'username':
+            raise ValueError("calculate_batch_metrics needs a calculator built with by_username=True")
+        creator_sums = self.group_sums.groupby(level=0, observed=True).sum().to_dict('index')
+        creator_sizes = self.group_sizes.groupby(level=0, observed=True).sum().to_dict()
+        group_sums, group_sizes = self.group_sums.to_dict('index'), self.group_sizes.to_dict()
+        no_posts = dict.fromkeys(SUM_COLUMNS, 0)
+
+        return [
+            self.creator_metrics(
+                profile,
+                creator_sums.get(profile['username'], no_posts),
+                creator_sizes.get(profile['username'], 0),
+                group_sums,
+                group_sizes,
+                (profile['username'],)
+            )
+            for profile in self.profile_df.drop_duplicates('username', keep='last').to_dict('records')
+        ]
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Index
 from sqlalchemy.orm import declarative_base
 from datetime import datetime, timezone
 
@@ -29,6 +29,10 @@ class CreatorMetrics(Base):
 
 class ContentTypeMetrics(Base):
     __tablename__ = 'content_type_metrics'
+    # One row per creator and content/media type; also the ON CONFLICT target of save_batch_metrics
+    __table_args__ = (
+        Index('uq_content_type_metrics_key', 'username', 'content_type', 'media_type', unique=True),
+    )
     
     id = Column(Integer, primary_key=True)
     username = Column(String, index=True)
@@ -0,0 +1,33 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+
+PROFILE_CSV = "username,profile_url,country,followers\ncreator,https://www.instagram.com/creator,Saudi Arabia,1000\n"
+POSTS_HEADER = "username,description,pub_date,like_count,comment_count,view_count,play_count,share_count,product_type,saves\n"
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(api.app) as client:
+        yield client
+
+def compute(client, like_count):
+    pub_date = (datetime.now(timezone.utc) - timedelta(days=1)).strftime("%Y-%m-%d %H:%M:%S")
+    posts_csv = POSTS_HEADER + f"creator,hello,{pub_date},{like_count},1,2,3,4,Video,5\n"
+    return client.post("/api/v1/metrics/compute", files={
+        "profile_file": ("profile.csv", PROFILE_CSV),
+        "posts_file": ("posts.csv", posts_csv)
+    })
+
+@pytest.mark.parametrize("like_count", ["-1", "1.5", "2000000000000", "99999999999999999999", "abc"])
+def test_invalid_counters_are_rejected(client, like_count):
+    response = compute(client, like_count)
+    assert response.status_code == 400
+    assert response.json()["detail"].startswith("Error reading CSV files")
+
+def test_large_counters_are_not_wrapped(client):
+    response = compute(client, "5000000000")
+    assert response.status_code == 200
+    assert response.json()["overall_metrics"]["avg_likes"] == 5000000000.0